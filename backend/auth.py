@@ -18,19 +18,26 @@ along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 '''
 
 import os
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.exc import SQLAlchemyError
 
 import models
 import schemas
-from database import get_db
+from cache import TTLCache
+from database import get_auth_db
 
 # Security configuration
 load_dotenv()
@@ -44,8 +51,25 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
 
+# Authenticated users are cached briefly so most requests need no user lookup.
+# Other workers see a deactivation once their entry expires.
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", 1024)),
+    ttl=PRINCIPAL_CACHE_TTL_SECONDS
+)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+# bcrypt is deliberately slow, so hashing runs on a small dedicated pool where it cannot
+# block the event loop or starve the shared threadpool. Work beyond the queue limit is
+# refused with a 503 straight away rather than queued behind a login burst.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 32))
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
@@ -56,14 +80,59 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, username: str, password: str):
+def _submit_hash_work(fn, *args) -> Future:
+    """Run password hashing work on the dedicated pool, or fail fast with a 503 when it is full"""
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
     try:
-        user = db.query(models.User).filter(models.User.username == username).first()
-        if not user or not verify_password(password, user.hashed_password):
-            return False
-        return user
+        future = _hash_executor.submit(fn, *args)
+    except Exception:
+        _hash_slots.release()
+        raise
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return future
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit_hash_work(verify_password, plain_password, hashed_password))
+
+def get_password_hash_bounded(password: str) -> str:
+    """Hash a password on the dedicated pool, for use from synchronous handlers"""
+    return _submit_hash_work(get_password_hash, password).result()
+
+def _load_user_sync(db: Session, username: str):
+    user = db.execute(select(models.User).where(models.User.username == username)).scalars().first()
+    if user is not None:
+        db.expunge(user)
+    db.rollback()
+    return user
+
+async def _load_user(db: Union[AsyncSession, Session], username: str):
+    """
+    Load a user by username, detached so it stays usable after the session is done with.
+    Without an async driver db is a sync session, queried in the threadpool.
+    """
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(_load_user_sync, db, username)
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    user = result.scalars().first()
+    if user is not None:
+        db.expunge(user)
+    # End the transaction so the connection goes back to the pool during any slow work that follows
+    await db.rollback()
+    return user
+
+async def authenticate_user(db: Union[AsyncSession, Session], username: str, password: str):
+    try:
+        user = await _load_user(db, username)
     except SQLAlchemyError:
         return False
+    if not user or not await verify_password_async(password, user.hashed_password):
+        return False
+    return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -81,7 +150,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
             detail="Could not create access token"
         )
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def invalidate_principal(username: str) -> None:
+    """
+    Drop a user from the principal cache. Anything that deactivates or deletes a
+    user must call this after committing, so the change applies at once in this worker.
+    """
+    principal_cache.pop(username)
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Union[AsyncSession, Session] = Depends(get_auth_db)
+):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -96,10 +175,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
+    user = principal_cache.get(token_data.username)
+    if user is not None:
+        return user
+    
     try:
-        user = db.query(models.User).filter(models.User.username == token_data.username).first()
+        user = await _load_user(db, token_data.username)
         if user is None:
             raise credentials_exception
+        principal_cache.set(token_data.username, user)
         return user
     except SQLAlchemyError:
         raise HTTPException(
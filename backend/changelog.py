@@ -0,0 +1,94 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+import pytz
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+from database import IS_SQLITE
+from logger_config import logger
+
+# Entity types recorded in the change log
+JOB = "job"
+ASSET = "asset"
+CUSTOMER = "customer"
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+# How long entries are kept; clients whose cursor is older than this must reload everything
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", 30))
+
+# Entries younger than this are held back from the change feed, so that a transaction
+# still in flight when a poll runs commits its entries before the cursor passes them.
+# SQLite serializes writers, so entries there always commit in ID order.
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", 0 if IS_SQLITE else 5))
+
+# Expired entries are deleted from the table at most this often
+PRUNE_INTERVAL_SECONDS = 600
+_last_prune = 0.0
+
+def record(db: Session, entity_type: str, entity_ids: Iterable[int], action: str = UPDATED) -> None:
+    """
+    Record changes to entities within the caller's transaction, so a change is
+    logged if and only if it is committed.
+
+    Entry IDs are allocated in commit order on SQLite, where writers are
+    serialized. On databases with concurrent writers an entry can commit after
+    one with a higher ID; the change feed only moves its cursor past entries
+    older than CHANGE_FEED_SETTLE_SECONDS so that it does not skip them, which
+    holds as long as no transaction takes longer than that to commit.
+    """
+    rows = [
+        {"entity_type": entity_type, "entity_id": entity_id, "action": action}
+        for entity_id in dict.fromkeys(entity_ids)
+    ]
+    if not rows:
+        return
+    db.execute(insert(models.ChangeLogEntry), rows)
+    _prune_expired(db)
+
+def settled_cutoff() -> Optional[datetime]:
+    """Entries created after this time may still have earlier IDs in flight, or None if none can"""
+    if CHANGE_FEED_SETTLE_SECONDS <= 0:
+        return None
+    return datetime.now(pytz.UTC) - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+
+def _prune_expired(db: Session) -> None:
+    """Delete entries older than the retention period, at most once per PRUNE_INTERVAL_SECONDS"""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < PRUNE_INTERVAL_SECONDS:
+        return
+    _last_prune = now
+    cutoff = datetime.now(pytz.UTC) - timedelta(days=CHANGE_LOG_RETENTION_DAYS)
+    # The newest entry is always kept so the oldest remaining ID shows how far back the log goes
+    newest = select(func.max(models.ChangeLogEntry.id)).scalar_subquery()
+    deleted = db.execute(
+        delete(models.ChangeLogEntry)
+        .where(models.ChangeLogEntry.date_created < cutoff, models.ChangeLogEntry.id < newest)
+    ).rowcount
+    if deleted:
+        logger.debug(f"Pruned {deleted} expired change log entries")
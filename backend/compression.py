@@ -0,0 +1,230 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import os
+import threading
+import time
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional; without it responses are only gzip compressed
+    brotli = None
+
+# Bodies smaller than this are sent as they are
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+# Responses with these content types are never compressed: event streams must
+# reach the client as soon as each event is written
+SKIPPED_CONTENT_TYPES = ("text/event-stream",)
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick br or gzip from an Accept-Encoding header, or None to send the body as it is"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        # wbits 31 writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class CompressionStats:
+    """Bytes and CPU time spent compressing, per route"""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, encoding, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "responses": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0, "cpu_ms": 0.0
+                }
+            stats["responses"] += 1
+            stats["bytes_in"] += bytes_in
+            stats["bytes_out"] += bytes_out
+            if encoding is not None:
+                stats["compressed"] += 1
+                stats["cpu_ms"] += cpu_seconds * 1000
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._routes.items()}
+        for stats in routes.values():
+            stats["ratio"] = round(stats["bytes_in"] / stats["bytes_out"], 2) if stats["bytes_out"] else None
+            stats["cpu_ms"] = round(stats["cpu_ms"], 3)
+        return {
+            "encodings": ["br", "gzip"] if brotli is not None else ["gzip"],
+            "minimum_size": COMPRESSION_MINIMUM_SIZE,
+            "routes": routes,
+        }
+
+compression_stats = CompressionStats()
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with brotli or gzip, as negotiated with the client.
+
+    Bodies under minimum_size, event streams and responses that are already
+    encoded pass through untouched. Streamed bodies are compressed chunk by
+    chunk and flushed after each one, so clients see data as it is produced.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE, stats: CompressionStats = compression_stats):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        await CompressionResponder(self.app, encoding, self.minimum_size, self.stats)(scope, receive, send)
+
+class CompressionResponder:
+    """Handles one response, deciding from its headers and first body chunk whether to compress it"""
+
+    def __init__(self, app, encoding, minimum_size: int, stats: CompressionStats):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.stats = stats
+        self.scope = None
+        self.send = None
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    async def __call__(self, scope, receive, send):
+        self.scope = scope
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    def route(self) -> str:
+        # The route template keeps job and asset IDs from creating a stats entry each
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    def compress(self, data: bytes, more_body: bool) -> bytes:
+        start = time.thread_time()
+        body = self.encoder.compress(data) + (self.encoder.flush() if more_body else self.encoder.finish())
+        self.cpu_seconds += time.thread_time() - start
+        return body
+
+    async def send_with_compression(self, message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                self.encoding is None
+                or message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith(SKIPPED_CONTENT_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if self.start_message is not None:
+            # First body chunk: small complete bodies go out as they are
+            start_message, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start_message["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                self.stats.record(self.route(), None, len(body), len(body), 0.0)
+                await self.send(start_message)
+                await self.send(message)
+                return
+            self.encoder = BrotliEncoder(BROTLI_QUALITY) if self.encoding == "br" else GzipEncoder(GZIP_LEVEL)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self.bytes_in += len(body)
+            compressed = self.compress(body, more_body)
+            self.bytes_out += len(compressed)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(compressed))
+            await self.send(start_message)
+        else:
+            self.bytes_in += len(body)
+            compressed = self.compress(body, more_body)
+            self.bytes_out += len(compressed)
+
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+        if not more_body:
+            self.stats.record(self.route(), self.encoding, self.bytes_in, self.bytes_out, self.cpu_seconds)
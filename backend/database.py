@@ -17,7 +17,13 @@ You should have received a copy of the GNU General Public License
 along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 '''
 
-from sqlalchemy import create_engine, engine_from_config
+import importlib.util
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import create_engine, engine_from_config, event, inspect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -27,31 +33,215 @@ import os
 # SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_FILE}"
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-# SQLite-specific connect args
-connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+# Optional read-only replica used by GET endpoints; reads go to the primary when unset
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("DATABASE_READ_URL")
 
-# Add timezone support for non-SQLite databases
-if not SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    connect_args["timezone"] = True
+# Request header that sends a read to the primary, for clients that must see their own writes
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+def get_connect_args(url: str) -> dict:
+    # SQLite-specific connect args
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+
+    # Add timezone support for non-SQLite databases
+    if not url.startswith("sqlite"):
+        connect_args["timezone"] = True
+    return connect_args
+
+connect_args = get_connect_args(SQLALCHEMY_DATABASE_URL)
+
+# PRAGMAs applied to every SQLite connection. WAL lets readers and a writer work at the
+# same time, and synchronous=NORMAL only fsyncs at checkpoints, which is still safe
+# against application crashes in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    # Negative values are in KiB
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", 16384)),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE_BYTES", 128 * 1024 * 1024)),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configure a new SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def get_pool_options(url: str) -> dict:
+    """Pool settings for an engine on the given database URL"""
+    if not url.startswith("sqlite"):
+        return {
+            "pool_pre_ping": True,
+            "pool_recycle": 300,
+            "pool_size": 5,
+            "max_overflow": 10,
+        }
+    if ":memory:" in url or url.rstrip("/").endswith(":"):
+        # Every connection to an in-memory database is a separate database, so share one
+        return {"poolclass": StaticPool}
+    # Connections to a local file never go stale, so skip the per-checkout ping and
+    # recycling, and keep enough of them open that checkouts rarely wait
+    return {
+        "pool_size": int(os.getenv("SQLITE_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("SQLITE_MAX_OVERFLOW", 20)),
+        "pool_timeout": int(os.getenv("SQLITE_POOL_TIMEOUT_SECONDS", 30)),
+    }
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
     connect_args=connect_args,
     json_serializer=lambda obj: obj,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=5,
-    max_overflow=10,
-    echo=False
+    echo=False,
+    **get_pool_options(SQLALCHEMY_DATABASE_URL)
 )
 
+if IS_SQLITE:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if SQLALCHEMY_READ_DATABASE_URL:
+    read_engine = create_engine(
+        SQLALCHEMY_READ_DATABASE_URL,
+        connect_args=get_connect_args(SQLALCHEMY_READ_DATABASE_URL),
+        json_serializer=lambda obj: obj,
+        echo=False,
+        **get_pool_options(SQLALCHEMY_READ_DATABASE_URL)
+    )
+    if SQLALCHEMY_READ_DATABASE_URL.startswith("sqlite"):
+        event.listen(read_engine, "connect", apply_sqlite_pragmas)
+else:
+    read_engine = engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Async drivers used for the same database by handlers that run on the event loop,
+# with the module each one needs installed
+ASYNC_DRIVERS = {
+    "sqlite": ("sqlite+aiosqlite", "aiosqlite"),
+    "postgresql": ("postgresql+asyncpg", "asyncpg"),
+}
+
+def get_async_database_url(url: str) -> Optional[str]:
+    """Derive the async driver URL for a database URL, or None when no async driver is installed for it"""
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+", 1)[0]
+    if backend not in ASYNC_DRIVERS:
+        return None
+    driver, module = ASYNC_DRIVERS[backend]
+    if importlib.util.find_spec(module) is None:
+        return None
+    return f"{driver}://{rest}"
+
+def create_async_engine_for(url: str):
+    """Create the async engine, failing with a configuration error when its driver is missing"""
+    pool_options = get_pool_options(url)
+    if "poolclass" not in pool_options:
+        # aiosqlite defaults to NullPool for file databases; pool explicitly so connections are reused
+        pool_options["poolclass"] = AsyncAdaptedQueuePool
+    try:
+        async_engine = create_async_engine(url, echo=False, **pool_options)
+    except ImportError as e:
+        raise ValueError(
+            f"ASYNC_DATABASE_URL uses a driver that is not installed ({e.name}). "
+            "Install it, or unset ASYNC_DATABASE_URL to use the sync session for authentication."
+        ) from e
+    if url.startswith("sqlite"):
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    return async_engine
+
+# The async session is optional: an explicit ASYNC_DATABASE_URL must work, while a
+# derived one is only used when its driver is installed
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(SQLALCHEMY_DATABASE_URL)
+
+if ASYNC_DATABASE_URL:
+    async_engine = create_async_engine_for(ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
 Base = declarative_base()
 
+def _already_done(error: DBAPIError) -> bool:
+    """Whether a DDL statement failed because another worker made the same change first"""
+    message = str(error.orig).lower()
+    return "already exists" in message or "duplicate column" in message or "duplicate key name" in message
+
+def upgrade_schema():
+    """
+    Create missing tables and bring existing ones up to date with the models. Adds
+    missing nullable columns and indexes, and returns the added columns as
+    "table.column" names so callers can backfill them.
+
+    Every worker runs this at startup, so each change is made in its own
+    transaction and one that a concurrent worker has already made is skipped;
+    only the worker that added a column reports it.
+    """
+    for table in Base.metadata.sorted_tables:
+        try:
+            table.create(bind=engine, checkfirst=True)
+        except DBAPIError as e:
+            if not _already_done(e):
+                raise
+    added_columns = set()
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            try:
+                with engine.begin() as connection:
+                    connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            except DBAPIError as e:
+                if not _already_done(e):
+                    raise
+                continue
+            added_columns.add(f"{table.name}.{column.name}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except DBAPIError as e:
+                if not _already_done(e):
+                    raise
+    return added_columns
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_read_db(request: Request):
+    """
+    Session for read-only endpoints, bound to the replica when one is configured.
+    Requests sending the X-Read-Your-Writes header are served from the primary, so
+    a client that has just written is not shown stale replica data.
+    """
+    if request.headers.get(READ_YOUR_WRITES_HEADER):
+        db = SessionLocal()
+    else:
+        db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Authentication runs on the event loop with the async session when one is
+# available, and falls back to the sync session in the threadpool otherwise
+get_auth_db = get_async_db if AsyncSessionLocal is not None else get_db
@@ -0,0 +1,83 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import os
+from typing import Optional, Tuple
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+
+# Responses must be revalidated before reuse, but may be stored by the client
+CACHE_CONTROL = "private, no-cache"
+
+# How far below a scope's latest entry ID a late-committing entry still changes
+# its tag; a transaction would have to commit after this many later entries to go
+# unnoticed. Bounds the index range counted for each scope.
+LATE_COMMIT_WINDOW = int(os.getenv("ETAG_LATE_COMMIT_WINDOW", 1000))
+
+def compute_etag(db: Session, *scopes: Tuple[str, Optional[int]]) -> str:
+    """
+    Build a weak ETag from the change log rather than from the response body.
+
+    Each scope is an entity type and optionally one entity ID; the tag changes
+    whenever a change to any of them is logged. The oldest retained entry is
+    included too, so pruning the log can never bring back a tag a client holds
+    for data that has since changed.
+
+    With concurrent writers an entry can commit after one with a higher ID,
+    leaving the latest ID unchanged, so each scope's version also counts its
+    entries among the last LATE_COMMIT_WINDOW IDs before its latest.
+    """
+    entry = models.ChangeLogEntry
+    versions = []
+    for entity_type, entity_id in scopes:
+        conditions = [entry.entity_type == entity_type]
+        if entity_id is not None:
+            conditions.append(entry.entity_id == entity_id)
+        latest = select(func.max(entry.id)).where(*conditions).scalar_subquery()
+        recent = select(func.count()).where(*conditions, entry.id > latest - LATE_COMMIT_WINDOW).scalar_subquery()
+        versions.extend((latest, recent))
+    oldest = select(func.min(entry.id)).scalar_subquery()
+    row = db.execute(select(oldest, *versions)).one()
+    parts = [str(row[0] or 0)]
+    parts.extend(f"{latest or 0}.{recent}" for latest, recent in zip(row[1::2], row[2::2]))
+    return 'W/"' + "-".join(parts) + '"'
+
+def _matches(request: Request, etag: str) -> bool:
+    """Weak comparison of the request's If-None-Match against an ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def check_not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the client already has the current version, otherwise
+    set the ETag on the response being built and return None.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,306 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, Optional
+from sqlalchemy import (
+    Column, Float, Integer, MetaData, String, Table, Text,
+    create_engine, delete, func, insert, select
+)
+from sqlalchemy import event as sa_event
+
+from database import apply_sqlite_pragmas, get_connect_args, get_pool_options
+from logger_config import logger
+
+# Event types pushed to subscribers
+JOB_MOVED = "job.moved"
+JOB_STATUS = "job.status"
+JOB_SCANNED = "job.scanned"
+# Sent in place of events a subscriber was too slow to receive; it should reload via /changes/
+RESYNC = "resync"
+
+# Events held for each subscriber before it is considered too slow and told to resync
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 256))
+
+# Expired rows are deleted from the shared events table at most this often
+PRUNE_INTERVAL_SECONDS = 30
+
+class Subscription:
+    """
+    One client's view of the event stream, optionally limited to some assets and jobs.
+
+    Events are queued on the event loop the subscription was created on. When the
+    queue is full its contents are replaced by a single resync event, so a slow
+    client never holds up publishers or grows memory without bound.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        asset_ids: Iterable[int] = (),
+        job_ids: Iterable[int] = (),
+        maxsize: int = EVENT_QUEUE_SIZE
+    ):
+        self.loop = loop
+        self.asset_ids = set(asset_ids)
+        self.job_ids = set(job_ids)
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        if not self.asset_ids and not self.job_ids:
+            return True
+        data = event["data"]
+        return (
+            data.get("job_id") in self.job_ids
+            or data.get("asset_id") in self.asset_ids
+            or data.get("previous_asset_id") in self.asset_ids
+        )
+
+    def offer(self, event: dict) -> None:
+        """Queue an event, replacing the backlog with a resync event if full. Runs on the loop."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            while not self.queue.empty():
+                if self.queue.get_nowait()["type"] != RESYNC:
+                    self.dropped += 1
+            self.queue.put_nowait({"id": event["id"], "type": RESYNC, "data": {}})
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Wait for the next event, returning None if none arrives within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class LocalFanout:
+    """Delivers events to subscribers of the worker that published them only"""
+
+    name = "local"
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def start(self, deliver: Callable[[dict], None]) -> None:
+        pass
+
+    def publish(self, event_type: str, data: dict, deliver: Callable[[dict], None]) -> None:
+        deliver({"id": next(self._ids), "type": event_type, "data": data})
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+class SQLiteFanout:
+    """
+    Shares events between the workers on one machine through a table in a SQLite
+    database, with no external service.
+
+    Publishing inserts a row and delivers the event to this worker's subscribers
+    straight away. Every worker with subscribers polls the table for rows
+    inserted by the others, so events reach clients on other workers within
+    about one poll interval. Rows are kept for EVENT_RETENTION_SECONDS.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, url: str, poll_interval: float, retention_seconds: float):
+        self.url = url
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        # Identifies this worker's rows, which it has already delivered when publishing
+        self.origin = uuid.uuid4().hex
+        self.polled = 0
+        self.received = 0
+        self._engine = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._poller = None
+        self._last_prune = 0.0
+        self._metadata = MetaData()
+        self._table = Table(
+            "events",
+            self._metadata,
+            Column("id", Integer, primary_key=True),
+            Column("origin", String, nullable=False),
+            Column("type", String, nullable=False),
+            Column("data", Text, nullable=False),
+            Column("created_at", Float, nullable=False, index=True),
+            sqlite_autoincrement=True
+        )
+
+    def _get_engine(self):
+        with self._lock:
+            if self._engine is None:
+                engine = create_engine(
+                    self.url,
+                    connect_args=get_connect_args(self.url),
+                    **get_pool_options(self.url)
+                )
+                sa_event.listen(engine, "connect", apply_sqlite_pragmas)
+                self._metadata.create_all(engine)
+                self._engine = engine
+            return self._engine
+
+    def start(self, deliver: Callable[[dict], None]) -> None:
+        """Start polling for other workers' events, if not already polling"""
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._poller = threading.Thread(target=self._poll, args=(deliver,), name="event-poller", daemon=True)
+        self._poller.start()
+
+    def publish(self, event_type: str, data: dict, deliver: Callable[[dict], None]) -> None:
+        now = time.time()
+        with self._get_engine().begin() as connection:
+            event_id = connection.execute(
+                insert(self._table).values(
+                    origin=self.origin,
+                    type=event_type,
+                    data=json.dumps(data, separators=(",", ":")),
+                    created_at=now
+                )
+            ).inserted_primary_key[0]
+            if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                self._last_prune = now
+                connection.execute(delete(self._table).where(self._table.c.created_at < now - self.retention_seconds))
+        deliver({"id": event_id, "type": event_type, "data": data})
+
+    def _poll(self, deliver: Callable[[dict], None]) -> None:
+        table = self._table
+        engine = self._get_engine()
+        with engine.connect() as connection:
+            last_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                with engine.connect() as connection:
+                    rows = connection.execute(
+                        select(table.c.id, table.c.origin, table.c.type, table.c.data)
+                        .where(table.c.id > last_id)
+                        .order_by(table.c.id)
+                        .limit(1000)
+                    ).all()
+                self.polled += 1
+                for row in rows:
+                    last_id = row.id
+                    if row.origin != self.origin:
+                        self.received += 1
+                        deliver({"id": row.id, "type": row.type, "data": json.loads(row.data)})
+            except Exception as e:
+                logger.error(f"Error polling for events from other workers: {str(e)}")
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._poller is not None:
+            self._poller.join(timeout=self.poll_interval * 10)
+
+    def stats(self) -> dict:
+        return {"polled": self.polled, "received": self.received}
+
+def create_fanout(name: str):
+    """Create the fan-out backend selected by EVENT_BACKEND"""
+    if name == "local":
+        return LocalFanout()
+    if name == "sqlite":
+        return SQLiteFanout(
+            url=os.getenv("EVENT_DATABASE_URL", "sqlite:///./events.db"),
+            poll_interval=float(os.getenv("EVENT_POLL_INTERVAL_SECONDS", 0.05)),
+            retention_seconds=float(os.getenv("EVENT_RETENTION_SECONDS", 60))
+        )
+    raise ValueError(f"Unknown EVENT_BACKEND '{name}', expected one of: local, sqlite")
+
+class EventBroker:
+    """
+    Publish/subscribe for change events.
+
+    publish can be called from any thread, including the threadpool that runs the
+    sync endpoints. The fan-out backend decides which workers see an event; each
+    worker then hands it to its matching subscribers' event loops.
+    """
+
+    def __init__(self, fanout):
+        self.fanout = fanout
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self._dropped_by_closed = 0
+
+    def subscribe(self, asset_ids: Iterable[int] = (), job_ids: Iterable[int] = ()) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), asset_ids, job_ids)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        self.fanout.start(self.deliver)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.discard(subscription)
+                self._dropped_by_closed += subscription.dropped
+
+    def publish(self, event_type: str, data: dict) -> None:
+        """Send an event to every matching subscriber. Call only after the change is committed."""
+        with self._lock:
+            self.published += 1
+        try:
+            self.fanout.publish(event_type, data, self.deliver)
+        except Exception as e:
+            # The change itself is committed; clients catch up through /changes/
+            logger.error(f"Error publishing {event_type} event: {str(e)}")
+
+    def deliver(self, event: dict) -> None:
+        """Hand an event to this worker's matching subscribers"""
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.matches(event)]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it is unsubscribed when its stream ends
+                logger.debug("Dropped event for subscriber on a closed event loop")
+
+    def close(self) -> None:
+        self.fanout.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.fanout.name,
+                "subscribers": len(self._subscriptions),
+                "published": self.published,
+                "dropped": self._dropped_by_closed + sum(
+                    subscription.dropped for subscription in self._subscriptions
+                ),
+                **self.fanout.stats(),
+            }
+
+# Fan-out between workers: "sqlite" shares events through a local SQLite file, "local" keeps them in-process
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "sqlite")
+
+broker = EventBroker(create_fanout(EVENT_BACKEND))
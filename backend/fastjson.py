@@ -0,0 +1,106 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import os
+from typing import Any, Iterable, Optional
+import orjson
+from fastapi import HTTPException, Response
+
+# Serialize large list responses straight from rows with orjson rather than through the response schemas
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() in ("1", "true", "yes")
+
+# Naive datetimes are UTC, as in schemas.format_datetime
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def respond(content: Any, response: Response) -> FastJSONResponse:
+    """
+    Build a response from already projected content, keeping the headers and status
+    set on the endpoint's Response parameter, which FastAPI only applies to values
+    it serializes itself.
+    """
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(content, status_code=response.status_code or 200, headers=headers)
+
+class Projection:
+    """
+    The columns of a model that a response schema reads, and how to turn a row of
+    them into the dict the schema would serialize to.
+
+    Keys follow the schema's field order, so the JSON matches the schema's output
+    byte for byte. Fields listed as nested are not columns; their values are
+    supplied by the caller, already in their JSON form. When fields is given only
+    those of the schema's fields are included.
+    """
+
+    def __init__(self, schema, model, nested: Iterable[str] = (), fields: Optional[Iterable[str]] = None):
+        selected = None if fields is None else set(fields)
+        self.fields = [name for name in schema.model_fields if selected is None or name in selected]
+        self.nested = set(nested) & set(self.fields)
+        self.columns = [getattr(model, name) for name in self.fields if name not in self.nested]
+
+    def build(self, row, **nested_values) -> dict:
+        values = row._mapping
+        return {
+            name: nested_values[name] if name in self.nested else values[name]
+            for name in self.fields
+        }
+
+def parse_names(value: str, allowed: Iterable[str], parameter: str) -> set:
+    """Split a comma-separated query parameter, rejecting names not in allowed"""
+    allowed = list(allowed)
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names.difference(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid {parameter}: {', '.join(sorted(unknown))}, expected any of: {', '.join(allowed)}"
+        )
+    return names
+
+def sparse_projection(
+    schema,
+    model,
+    fields: Optional[str],
+    include: Optional[str] = None,
+    nested: Iterable[str] = ()
+) -> Optional[Projection]:
+    """
+    The projection for a request's ?fields= and ?include= parameters, or None when
+    neither is given and the full representation is wanted.
+
+    fields picks the schema's column fields, all of them when omitted, and include
+    the nested ones, none of them when omitted. id is always returned.
+    """
+    if fields is None and include is None:
+        return None
+    nested = [name for name in schema.model_fields if name in set(nested)]
+    columns = [name for name in schema.model_fields if name not in nested]
+    selected = set(columns) if fields is None else parse_names(fields, columns, "fields") | {"id"}
+    if include is not None:
+        selected |= parse_names(include, nested, "include")
+    return Projection(schema, model, nested=nested, fields=selected)
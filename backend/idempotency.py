@@ -0,0 +1,201 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import urlencode
+import pytz
+from fastapi import Header, HTTPException, Request, Response
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from cache import TTLCache
+from logger_config import logger
+
+# How long a stored response can be replayed for a repeated key
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 60 * 60))
+
+# Recently stored responses, so most retries are answered without a database round trip
+stored_responses = TTLCache(
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000)),
+    ttl=IDEMPOTENCY_KEY_TTL_SECONDS
+)
+
+# Expired keys are deleted from the table at most this often
+PRUNE_INTERVAL_SECONDS = 600
+_last_prune = 0.0
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+async def get_idempotency_key(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+) -> Optional[str]:
+    """
+    Read the optional Idempotency-Key request header. When one is sent, the request
+    is hashed here, where the body can still be awaited, for lookup and commit.
+    """
+    if idempotency_key is not None:
+        request.state.idempotency_request_hash = _request_hash(request.method, request, await request.body())
+    return idempotency_key
+
+def _request_hash(method: str, request: Request, body: bytes) -> str:
+    digest = hashlib.sha256()
+    query = urlencode(sorted(request.query_params.multi_items()))
+    for part in (method.encode(), request.url.path.encode(), query.encode()):
+        digest.update(part)
+        digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+def _scoped_key(user: models.User, key: str) -> str:
+    return f"{user.id}:{key}"
+
+def _replay(
+    method: str,
+    path: str,
+    request_hash: Optional[str],
+    status_code: int,
+    body: str,
+    request: Request
+) -> Response:
+    # Keys stored before request hashes were recorded are matched on method and path alone
+    matches = method == request.method and path == request.url.path and (
+        request_hash is None or request_hash == request.state.idempotency_request_hash
+    )
+    if not matches:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key has already been used for a different request"
+        )
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"}
+    )
+
+def lookup(db: Session, user: models.User, key: Optional[str], request: Request) -> Optional[Response]:
+    """Return the stored response for a key that has already been used, or None"""
+    if key is None:
+        return None
+    scoped_key = _scoped_key(user, key)
+
+    stored = stored_responses.get(scoped_key)
+    if stored is not None:
+        logger.debug(f"Replaying stored response for idempotency key {scoped_key} (cached)")
+        return _replay(*stored, request)
+
+    cutoff = datetime.now(pytz.UTC) - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+    record = (
+        db.query(models.IdempotencyKey)
+        .filter(
+            models.IdempotencyKey.key == scoped_key,
+            models.IdempotencyKey.date_created >= cutoff
+        )
+        .first()
+    )
+    if record is None:
+        return None
+    logger.debug(f"Replaying stored response for idempotency key {scoped_key}")
+    stored = (record.method, record.path, record.request_hash, record.status_code, record.response_body)
+    # Cache the key only for the rest of its lifetime, not a fresh TTL from now
+    created = record.date_created
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=pytz.UTC)
+    remaining = IDEMPOTENCY_KEY_TTL_SECONDS - (datetime.now(pytz.UTC) - created).total_seconds()
+    if remaining > 0:
+        stored_responses.set(scoped_key, stored, ttl=remaining)
+    return _replay(*stored, request)
+
+def commit(
+    db: Session,
+    user: models.User,
+    key: Optional[str],
+    request: Request,
+    response: BaseModel
+) -> Optional[Response]:
+    """
+    Commit the caller's transaction, storing the response under the key in the same
+    transaction so a write and its key are never recorded separately.
+
+    If a concurrent request with the same key committed first, the transaction is
+    rolled back and that request's stored response is returned instead. Returns
+    None when this request's writes were committed.
+    """
+    if key is None:
+        db.commit()
+        return None
+
+    scoped_key = _scoped_key(user, key)
+    stored = (
+        request.method,
+        request.url.path,
+        request.state.idempotency_request_hash,
+        200,
+        response.model_dump_json()
+    )
+    db.add(models.IdempotencyKey(
+        key=scoped_key,
+        user_id=user.id,
+        method=stored[0],
+        path=stored[1],
+        request_hash=stored[2],
+        status_code=stored[3],
+        response_body=stored[4]
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        replay = lookup(db, user, key, request)
+        if replay is None:
+            raise
+        logger.info(f"Concurrent request with idempotency key {scoped_key} already committed")
+        return replay
+
+    stored_responses.set(scoped_key, stored)
+    _prune_expired(db)
+    return None
+
+def _prune_expired(db: Session) -> None:
+    """Delete expired keys from the table, at most once per PRUNE_INTERVAL_SECONDS"""
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < PRUNE_INTERVAL_SECONDS:
+        return
+    _last_prune = now
+    try:
+        cutoff = datetime.now(pytz.UTC) - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+        deleted = (
+            db.query(models.IdempotencyKey)
+            .filter(models.IdempotencyKey.date_created < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        if deleted:
+            logger.debug(f"Pruned {deleted} expired idempotency keys")
+    except Exception as e:
+        logger.error(f"Error pruning expired idempotency keys: {str(e)}")
+        db.rollback()
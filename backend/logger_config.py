@@ -1,11 +1,20 @@
 """
 Logging configuration for OpenFactoryAssistant backend.
 Implements a comprehensive logging system with file and console outputs.
+
+Records are queued by the logging call and written to the files and console by
+a single background thread, so requests never wait on disk I/O.
 """
 
+import atexit
 import logging
 import logging.handlers
+import os
 import platform
+import queue
+import re
+import threading
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 
@@ -22,12 +31,157 @@ DEBUG_LOG = LOGS_DIR / "debug.log"
 MAX_BYTES = 10 * 1024 * 1024
 BACKUP_COUNT = 5
 
+# Records waiting to be written; when full, new records are dropped and counted
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Most records the writer takes from the queue before flushing the files
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 500))
+# How long ERROR and CRITICAL records wait for room in a full queue before being dropped
+LOG_ERROR_WAIT_SECONDS = 1.0
+
+# The host name does not change while the process runs
+HOSTNAME = platform.node()
+
 # Custom formatter with extra details
 class DetailedFormatter(logging.Formatter):
     def format(self, record):
-        record.hostname = platform.node()
+        record.hostname = HOSTNAME
         return super().format(record)
 
+# Access tokens in query strings, which /events/stream accepts from EventSource clients
+QUERY_TOKEN_PATTERN = re.compile(r"([?&]token=)[^&\s]*")
+
+def redact_query_tokens(text: str) -> str:
+    return QUERY_TOKEN_PATTERN.sub(r"\1[redacted]", text)
+
+class RedactQueryTokenFilter(logging.Filter):
+    """Masks access tokens in the request lines of uvicorn's access log"""
+
+    def filter(self, record):
+        # uvicorn.access records are (client, method, path with query string, HTTP version, status)
+        args = record.args
+        if isinstance(args, tuple) and len(args) >= 3 and isinstance(args[2], str) and "token=" in args[2]:
+            record.args = args[:2] + (redact_query_tokens(args[2]),) + args[3:]
+        return True
+
+class BatchFlushMixin:
+    """Leaves flushing to the log writer, which flushes once per batch rather than once per record"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+class BatchRotatingFileHandler(BatchFlushMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+class BatchStreamHandler(BatchFlushMixin, logging.StreamHandler):
+    pass
+
+class LogWriter:
+    """
+    A bounded queue of log records and the one background thread that writes them.
+
+    Each queued record carries the handlers it is for. The thread writes as many
+    records as are waiting, up to LOG_BATCH_SIZE, then flushes every handler it
+    wrote to once. Records that find the queue full are dropped and counted by
+    level; ERROR and above first wait up to LOG_ERROR_WAIT_SECONDS for room.
+    """
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE, batch_size: int = LOG_BATCH_SIZE):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.written = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.dropped = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, handlers, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.ERROR:
+                self.queue.put((handlers, record), timeout=LOG_ERROR_WAIT_SECONDS)
+            else:
+                self.queue.put_nowait((handlers, record))
+        except queue.Full:
+            with self._lock:
+                self.dropped[record.levelname] += 1
+            return
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(batch)
+                    return
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch) -> None:
+        used = {}
+        for handlers, record in batch:
+            for handler in handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    used[id(handler)] = handler
+        for handler in used.values():
+            try:
+                handler.flush_batch()
+            except OSError:
+                # Whatever was not flushed goes out with the next batch
+                pass
+        self.written += len(batch)
+        self.batches += 1
+
+    def stop(self) -> None:
+        """Write everything already queued, then stop the thread"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self.queue.put(None)
+        self._thread.join(timeout=10)
+
+    def stats(self) -> dict:
+        with self._lock:
+            dropped = dict(self.dropped)
+        return {
+            "queued": self.queue.qsize(),
+            "max_queued": self.max_depth,
+            "maxsize": self.queue.maxsize,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": dropped,
+        }
+
+class QueuedLogHandler(logging.handlers.QueueHandler):
+    """Hands records to the log writer for the given handlers instead of writing them in the caller"""
+
+    def __init__(self, writer: LogWriter, *handlers: logging.Handler):
+        super().__init__(writer.queue)
+        self.writer = writer
+        self.targets = handlers
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.writer.submit(self.targets, record)
+
+# Writes the records of every queued handler; drained at interpreter exit before logging shuts down
+log_writer = LogWriter()
+atexit.register(log_writer.stop)
+
 # Log format with detailed information
 LOG_FORMAT = "%(asctime)s | %(hostname)s | %(levelname)s | %(module)s:%(lineno)d | %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
@@ -42,38 +196,36 @@ def setup_logger():
     formatter = DetailedFormatter(LOG_FORMAT, datefmt=DATE_FORMAT)
 
     # Error file handler (includes ERROR and CRITICAL)
-    error_handler = logging.handlers.RotatingFileHandler(
+    error_handler = BatchRotatingFileHandler(
         ERROR_LOG, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
 
     # Info file handler (includes INFO and above)
-    info_handler = logging.handlers.RotatingFileHandler(
+    info_handler = BatchRotatingFileHandler(
         INFO_LOG, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT
     )
     info_handler.setLevel(logging.INFO)
     info_handler.setFormatter(formatter)
 
     # Debug file handler (includes all levels)
-    debug_handler = logging.handlers.RotatingFileHandler(
+    debug_handler = BatchRotatingFileHandler(
         DEBUG_LOG, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT
     )
     debug_handler.setLevel(logging.DEBUG)
     debug_handler.setFormatter(formatter)
 
     # Console handler (for development)
-    console_handler = logging.StreamHandler()
+    console_handler = BatchStreamHandler()
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
 
-    # Add all handlers to the logger
-    logger.addHandler(error_handler)
-    logger.addHandler(info_handler)
-    logger.addHandler(debug_handler)
-    logger.addHandler(console_handler)
+    # Route all handlers through the background writer
+    logger.addHandler(QueuedLogHandler(log_writer, error_handler, info_handler, debug_handler, console_handler))
 
     return logger
 
 # Initialize logger
 logger = setup_logger()
+logging.getLogger("uvicorn.access").addFilter(RedactQueryTokenFilter())
@@ -21,23 +21,38 @@ from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from typing import Union
 from datetime import timedelta, datetime
 import os
 import traceback
 from dotenv import load_dotenv
 
-from routers import users, customers, jobs, assets, logs
+from routers import users, customers, jobs, assets, logs, changes, event_stream
 import models, schemas
-from database import engine, get_db
-from auth import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from logger_config import logger
+from database import engine, get_auth_db, upgrade_schema
+from auth import (
+    authenticate_user,
+    create_access_token,
+    get_current_active_user,
+    principal_cache,
+    ACCESS_TOKEN_EXPIRE_MINUTES
+)
+import idempotency
+import events
+import refdata
+from compression import CompressionMiddleware, compression_stats
+from logger_config import logger, log_writer
+from pagination import NEXT_CURSOR_HEADER
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Create and upgrade database tables; safe for several workers starting at once
+if "jobs.current_location_id" in upgrade_schema():
+    with engine.begin() as connection:
+        models.backfill_current_locations(connection)
 
 app = FastAPI(
     title="OpenFactoryAssistant API",
@@ -63,6 +78,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],  
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 # Configure trusted hosts
@@ -78,6 +94,9 @@ app.add_middleware(
     allowed_hosts=allowed_hosts
 )
 
+# Compress large responses for clients that accept brotli or gzip
+app.add_middleware(CompressionMiddleware)
+
 @app.middleware("http")
 async def logging_middleware(request: Request, call_next):
     """Middleware to log all requests and responses"""
@@ -128,6 +147,7 @@ async def startup_event():
 async def shutdown_event():
     """Log application shutdown"""
     logger.info("Application shutting down")
+    events.broker.close()
 
 # Error handler for database errors
 @app.exception_handler(Exception)
@@ -154,18 +174,36 @@ app.include_router(customers.router)
 app.include_router(jobs.router)
 app.include_router(assets.router)
 app.include_router(logs.router)
+app.include_router(changes.router)
+app.include_router(event_stream.router)
 
 @app.get("/")
 def read_root():
     logger.info("Root endpoint accessed")
     return {"message": "Welcome to the OpenFactoryAssistant API", "version": "1.0.0"}
 
+@app.get("/stats")
+def read_stats(current_user: models.User = Depends(get_current_active_user)):
+    """Hit/miss counters and sizes of the in-process caches in this worker"""
+    return {
+        "principal_cache": principal_cache.stats(),
+        "recent_scans": jobs.recent_scans.stats(),
+        "idempotency": idempotency.stored_responses.stats(),
+        "events": events.broker.stats(),
+        "reference_data": {
+            "assets": refdata.assets.stats(),
+            "customers": refdata.customers.stats(),
+        },
+        "compression": compression_stats.stats(),
+        "logging": log_writer.stats(),
+    }
+
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: Union[AsyncSession, Session] = Depends(get_auth_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         logger.warning(f"Failed login attempt for user: {form_data.username}")
         raise HTTPException(
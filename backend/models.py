@@ -17,7 +17,7 @@ You should have received a copy of the GNU General Public License
 along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 '''
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Enum
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Enum, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import pytz
@@ -72,9 +72,30 @@ class Job(Base):
     customer_id = Column(Integer, ForeignKey("customers.id"))
     date_created = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     due_date = Column(DateTime(timezone=True))
+    # Denormalized open location, maintained by the move and status endpoints
+    current_location_id = Column(
+        Integer,
+        ForeignKey("job_locations.id", use_alter=True, name="fk_jobs_current_location_id"),
+        nullable=True
+    )
+    current_asset_id = Column(Integer, ForeignKey("assets.id"), nullable=True, index=True)
     
     customer = relationship("Customer", back_populates="jobs")
-    locations = relationship("JobLocation", back_populates="job", order_by="JobLocation.arrival_time")
+    locations = relationship(
+        "JobLocation",
+        back_populates="job",
+        foreign_keys="JobLocation.job_id",
+        order_by="JobLocation.arrival_time"
+    )
+    current_location = relationship("JobLocation", foreign_keys=[current_location_id], post_update=True)
+
+    # Composite indexes for the common dashboard filters and sorts in read_jobs
+    __table_args__ = (
+        Index("ix_jobs_status_due_date", "status", "due_date"),
+        Index("ix_jobs_customer_id_date_created", "customer_id", "date_created"),
+        Index("ix_jobs_date_created_id", "date_created", "id"),
+        Index("ix_jobs_due_date", "due_date"),
+    )
 
 class JobLocation(Base):
     __tablename__ = "job_locations"
@@ -85,5 +106,61 @@ class JobLocation(Base):
     arrival_time = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC))
     departure_time = Column(DateTime(timezone=True), nullable=True)
     
-    job = relationship("Job", back_populates="locations")
+    job = relationship("Job", back_populates="locations", foreign_keys=[job_id])
     asset = relationship("Asset", back_populates="job_locations")
+
+    __table_args__ = (
+        Index("ix_job_locations_job_id_arrival_time", "job_id", "arrival_time"),
+        Index("ix_job_locations_asset_id_departure_time", "asset_id", "departure_time"),
+        # Partial index over open locations only, which stays small however much history accumulates
+        Index(
+            "ix_job_locations_open",
+            "job_id",
+            "asset_id",
+            sqlite_where=text("departure_time IS NULL"),
+            postgresql_where=text("departure_time IS NULL")
+        ),
+    )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Client supplied key, scoped to the user that sent it
+    key = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    method = Column(String)
+    path = Column(String)
+    # Hash of the method, path, query string and body; a reused key must match it
+    request_hash = Column(String)
+    status_code = Column(Integer)
+    response_body = Column(Text)
+    date_created = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), index=True)
+
+class ChangeLogEntry(Base):
+    __tablename__ = "change_log"
+
+    # AUTOINCREMENT on SQLite so IDs are never reused and can serve as a change feed cursor
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)
+    date_created = Column(DateTime(timezone=True), default=lambda: datetime.now(pytz.UTC), index=True)
+
+    # Latest change per entity type, and per entity, for ETags
+    __table_args__ = (
+        Index("ix_change_log_entity_type_id", "entity_type", "id"),
+        Index("ix_change_log_entity_type_entity_id_id", "entity_type", "entity_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+def backfill_current_locations(connection):
+    """Populate the denormalized current location of every job from its open location"""
+    connection.execute(text(
+        "UPDATE jobs SET "
+        "current_location_id = ("
+        "SELECT id FROM job_locations WHERE job_locations.job_id = jobs.id AND departure_time IS NULL "
+        "ORDER BY arrival_time DESC LIMIT 1), "
+        "current_asset_id = ("
+        "SELECT asset_id FROM job_locations WHERE job_locations.job_id = jobs.id AND departure_time IS NULL "
+        "ORDER BY arrival_time DESC LIMIT 1)"
+    ))
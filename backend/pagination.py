@@ -0,0 +1,117 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import base64
+import bisect
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, List, Optional
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.orm import Query
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or not values:
+            raise ValueError("Cursor must contain a non-empty list")
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(
+    query: Query,
+    id_column,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    sort_column=None,
+    descending: bool = False
+) -> list:
+    """
+    Fetch one page of a query ordered by (sort_column, id), or by id alone.
+
+    With a cursor, rows after the cursor's sort key are selected using an index
+    on the key columns, so the cost of a page does not depend on how deep it is.
+    Without one the legacy offset path is used. The sort column must not be
+    nullable when used with a cursor.
+    """
+    key_columns = [id_column] if sort_column is None else [sort_column, id_column]
+    query = query.order_by(*[column.desc() if descending else column for column in key_columns])
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        if len(values) != len(key_columns) or type(values[-1]) is not int:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        last_id = values[-1]
+        after_id = id_column < last_id if descending else id_column > last_id
+        if sort_column is None:
+            query = query.filter(after_id)
+        else:
+            last_value = _parse_key_value(sort_column, values[0])
+            after_value = sort_column < last_value if descending else sort_column > last_value
+            query = query.filter(or_(after_value, and_(sort_column == last_value, after_id)))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def paginate_items(items: list, skip: int, limit: int, cursor: Optional[str] = None) -> list:
+    """Fetch one page of a list already ordered by id, as paginate does for a query"""
+    if cursor is None:
+        return items[skip:skip + limit]
+    values = decode_cursor(cursor)
+    if len(values) != 1 or type(values[0]) is not int:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    start = bisect.bisect_right([item.id for item in items], values[0])
+    return items[start:start + limit]
+
+def _parse_key_value(column, value):
+    """Restore a sort key value that was converted to JSON in the cursor"""
+    if isinstance(column.type, DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value
+
+def _key_value(item, column):
+    """Convert a sort key value of a row to something JSON can carry"""
+    value = getattr(item, column.key)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+def set_next_cursor(response: Response, items: list, limit: int, sort_column=None) -> None:
+    """Set the next-page cursor header when the page is full"""
+    if items and len(items) >= limit:
+        last = items[-1]
+        values = [last.id] if sort_column is None else [_key_value(last, sort_column), last.id]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(values)
@@ -0,0 +1,159 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+import changelog
+import etags
+from logger_config import logger
+
+# How often each worker checks whether another worker has changed the reference data
+REFDATA_CHECK_SECONDS = float(os.getenv("REFDATA_CHECK_SECONDS", 2))
+
+# Tables with more rows than this are not cached
+REFDATA_CACHE_MAX_ENTRIES = int(os.getenv("REFDATA_CACHE_MAX_ENTRIES", 5000))
+
+class ReferenceCache:
+    """
+    In-process copy of a small, rarely changing table, such as assets or customers.
+
+    The whole table is held as response schemas in ID order, with the table's
+    change log ETag as its version stamp. The stamp is checked against the
+    database at most every check_interval seconds, and the table reloaded when it
+    has moved, so writes in other workers are picked up within that interval.
+    Writes in this worker call invalidate so they are seen immediately.
+
+    IDs missing from the cache are looked up in the database, so a row created
+    moments ago in another worker is never reported as missing.
+    """
+
+    def __init__(self, model, schema, entity_type: str, maxsize: int, check_interval: float):
+        self.model = model
+        self.schema = schema
+        self.entity_type = entity_type
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._items = None
+        self._etag = None
+        self._checked_at = None
+        self._generation = 0
+
+    def _refresh(self, db: Session) -> None:
+        """Reload the table if its version stamp has moved since it was last checked"""
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            generation = self._generation
+            # Read the stamp before the rows, so the rows are never older than the stamp
+            etag = etags.compute_etag(db, (self.entity_type, None))
+            if self._checked_at is None or etag != self._etag:
+                rows = db.query(self.model).order_by(self.model.id).limit(self.maxsize + 1).all()
+                if len(rows) > self.maxsize:
+                    logger.warning(f"Not caching {self.model.__tablename__}: more than {self.maxsize} rows")
+                    self._items = None
+                else:
+                    self._items = {row.id: self.schema.model_validate(row) for row in rows}
+                self._etag = etag
+                self.reloads += 1
+            # A write that invalidated the cache meanwhile may not be in what was just read
+            if generation == self._generation:
+                self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Drop the cached table after a write in this worker. Call after committing."""
+        with self._lock:
+            self._generation += 1
+            self._checked_at = None
+
+    def etag(self, db: Session) -> str:
+        """ETag of the table, as etags.compute_etag would give for its entity type"""
+        self._refresh(db)
+        return self._etag
+
+    def items(self, db: Session) -> Optional[List]:
+        """Every row in ID order, or None if the table is too large to cache"""
+        self._refresh(db)
+        items = self._items
+        return None if items is None else list(items.values())
+
+    def get(self, db: Session, entity_id: int):
+        """The row with the given ID, or None if it does not exist"""
+        self._refresh(db)
+        items = self._items
+        if items is not None and entity_id in items:
+            self.hits += 1
+            return items[entity_id]
+        self.misses += 1
+        row = db.query(self.model).filter(self.model.id == entity_id).first()
+        return None if row is None else self.schema.model_validate(row)
+
+    def get_many(self, db: Session, entity_ids: Iterable[int]) -> Dict[int, object]:
+        """The rows with the given IDs that exist, by ID, loading any not cached in one query"""
+        self._refresh(db)
+        items = self._items or {}
+        entity_ids = set(entity_ids)
+        found = {entity_id: items[entity_id] for entity_id in entity_ids if entity_id in items}
+        missing = entity_ids.difference(found)
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            for row in db.scalars(select(self.model).where(self.model.id.in_(missing))):
+                found[row.id] = self.schema.model_validate(row)
+        return found
+
+    def existing(self, db: Session, entity_ids: Iterable[int]) -> Set[int]:
+        """Those of the given IDs that exist"""
+        self._refresh(db)
+        items = self._items or {}
+        entity_ids = set(entity_ids)
+        found = {entity_id for entity_id in entity_ids if entity_id in items}
+        missing = entity_ids - found
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            found.update(db.scalars(select(self.model.id).where(self.model.id.in_(missing))))
+        return found
+
+    def stats(self) -> dict:
+        items = self._items
+        return {
+            "size": None if items is None else len(items),
+            "maxsize": self.maxsize,
+            "check_interval": self.check_interval,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+        }
+
+assets = ReferenceCache(models.Asset, schemas.Asset, changelog.ASSET, REFDATA_CACHE_MAX_ENTRIES, REFDATA_CHECK_SECONDS)
+customers = ReferenceCache(models.Customer, schemas.Customer, changelog.CUSTOMER, REFDATA_CACHE_MAX_ENTRIES, REFDATA_CHECK_SECONDS)
@@ -17,14 +17,20 @@ You should have received a copy of the GNU General Public License
 along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 '''
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from datetime import datetime
+from collections import defaultdict
 
 import schemas
 import models
-from database import get_db
+import changelog
+import etags
+import refdata
+import fastjson
+from database import get_db, get_read_db
+from pagination import paginate, paginate_items, set_next_cursor
 from auth import get_current_active_user
 from logger_config import logger
 
@@ -35,6 +41,12 @@ router = APIRouter(
 
 # TODO: Implement support for asset locations on the frontend (maybe sizing as well?)
 
+def project_asset(asset, projection: fastjson.Projection) -> dict:
+    """The requested fields of a cached schemas.Asset or a row of the projection's columns"""
+    if isinstance(asset, schemas.Asset):
+        return asset.model_dump(mode="json", include=set(projection.fields))
+    return projection.build(asset)
+
 @router.post("/", response_model=schemas.Asset)
 def create_asset(
     asset: schemas.AssetCreate,
@@ -47,7 +59,10 @@ def create_asset(
         
         db_asset = models.Asset(**asset.model_dump())
         db.add(db_asset)
+        db.flush()
+        changelog.record(db, changelog.ASSET, [db_asset.id], changelog.CREATED)
         db.commit()
+        refdata.assets.invalidate()
         db.refresh(db_asset)
         
         logger.info(f"Asset created successfully: ID={db_asset.id}")
@@ -59,34 +74,92 @@ def create_asset(
 
 @router.get("/", response_model=List[schemas.Asset])
 def read_assets(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated asset fields to return; id is always included"),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all assets with pagination"""
+    """List all assets with pagination, by offset or by the cursor from the previous page"""
     try:
-        logger.debug(f"User {current_user.username} requesting assets list (skip={skip}, limit={limit})")
-        assets = db.query(models.Asset).offset(skip).limit(limit).all()
+        logger.debug(f"User {current_user.username} requesting assets list (skip={skip}, limit={limit}, cursor={cursor}, fields={fields})")
+        projection = fastjson.sparse_projection(schemas.Asset, models.Asset, fields)
+        not_modified = etags.check_not_modified(request, response, refdata.assets.etag(db))
+        if not_modified is not None:
+            return not_modified
+        cached = refdata.assets.items(db)
+        if cached is not None:
+            assets = paginate_items(cached, skip, limit, cursor)
+        elif projection is not None:
+            assets = paginate(db.query(*projection.columns), models.Asset.id, skip, limit, cursor)
+        else:
+            assets = paginate(db.query(models.Asset), models.Asset.id, skip, limit, cursor)
+        set_next_cursor(response, assets, limit)
         logger.debug(f"Retrieved {len(assets)} assets")
+        if projection is not None:
+            return fastjson.respond([project_asset(asset, projection) for asset in assets], response)
         return assets
     except Exception as e:
         logger.error(f"Error retrieving assets list: {str(e)}")
         raise
 
+@router.get("/snapshot", response_model=List[schemas.AssetWithCurrentJobs])
+def read_assets_snapshot(
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get every asset together with the jobs currently at it (no departure time set)"""
+    try:
+        logger.debug(f"User {current_user.username} requesting assets snapshot")
+        assets = db.query(models.Asset).order_by(models.Asset.id).all()
+        
+        # Load every job that is currently at an asset in bulk rather than once per asset
+        current_jobs = (
+            db.query(models.Job)
+            .options(selectinload(models.Job.locations))
+            .filter(models.Job.current_asset_id.isnot(None))
+            .order_by(models.Job.id)
+            .all()
+        )
+        
+        jobs_by_asset = defaultdict(list)
+        for job in current_jobs:
+            jobs_by_asset[job.current_asset_id].append(job)
+        
+        snapshot = [
+            schemas.AssetWithCurrentJobs(
+                **schemas.Asset.model_validate(asset).model_dump(),
+                current_jobs=jobs_by_asset[asset.id]
+            )
+            for asset in assets
+        ]
+        logger.debug(f"Retrieved snapshot of {len(snapshot)} assets with {len(current_jobs)} current jobs")
+        return snapshot
+    except Exception as e:
+        logger.error(f"Error retrieving assets snapshot: {str(e)}")
+        raise
+
 @router.get("/{asset_id}", response_model=schemas.Asset)
 def read_asset(
     asset_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated asset fields to return; id is always included"),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get a specific asset by ID"""
+    """Get a specific asset by ID, optionally only the requested fields"""
     try:
-        logger.debug(f"User {current_user.username} requesting asset ID={asset_id}")
-        asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
+        logger.debug(f"User {current_user.username} requesting asset ID={asset_id} (fields={fields})")
+        projection = fastjson.sparse_projection(schemas.Asset, models.Asset, fields)
+        asset = refdata.assets.get(db, asset_id)
         if asset is None:
             logger.warning(f"Asset not found: ID={asset_id}")
             raise HTTPException(status_code=404, detail="Asset not found")
+        if projection is not None:
+            return fastjson.respond(project_asset(asset, projection), response)
         return asset
     except HTTPException:
         raise
@@ -98,18 +171,15 @@ def read_asset(
 def read_asset_current_jobs(
     asset_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all jobs currently at this asset (no departure time set)"""
     try:
         logger.debug(f"User {current_user.username} requesting current jobs for asset ID={asset_id}")
         current_jobs = (
             db.query(models.Job)
-            .join(models.JobLocation)
-            .filter(
-                models.JobLocation.asset_id == asset_id,
-                models.JobLocation.departure_time.is_(None)
-            )
+            .options(selectinload(models.Job.locations))
+            .filter(models.Job.current_asset_id == asset_id)
             .all()
         )
         logger.debug(f"Found {len(current_jobs)} current jobs for asset ID={asset_id}")
@@ -131,11 +201,7 @@ def delete_asset(
         # Check if asset has any current jobs
         current_jobs = (
             db.query(models.Job)
-            .join(models.JobLocation)
-            .filter(
-                models.JobLocation.asset_id == asset_id,
-                models.JobLocation.departure_time.is_(None)
-            )
+            .filter(models.Job.current_asset_id == asset_id)
             .all()
         )
         
@@ -151,8 +217,10 @@ def delete_asset(
         if result == 0:
             logger.warning(f"Asset not found for deletion: ID={asset_id}")
             raise HTTPException(status_code=404, detail="Asset not found")
-            
+        
+        changelog.record(db, changelog.ASSET, [asset_id], changelog.DELETED)
         db.commit()
+        refdata.assets.invalidate()
         logger.info(f"Asset ID={asset_id} deleted successfully")
         return {"message": "Asset deleted"}
         
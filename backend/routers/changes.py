@@ -0,0 +1,143 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from typing import Optional
+
+import schemas
+import models
+import changelog
+from database import get_read_db
+from auth import get_current_active_user
+from logger_config import logger
+from routers.jobs import job_load_options, to_utc
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["Changes"]
+)
+
+# Model for each entity type recorded in the change log
+CHANGE_MODELS = {
+    changelog.JOB: models.Job,
+    changelog.ASSET: models.Asset,
+    changelog.CUSTOMER: models.Customer,
+}
+
+@router.get("/", response_model=schemas.ChangeFeed)
+def read_changes(
+    since: Optional[int] = Query(None, ge=0, description="Cursor returned by the previous call"),
+    limit: int = Query(1000, ge=1, le=5000),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the jobs, assets and customers changed since a cursor, in their current state,
+    along with the cursor to pass next time. Without a cursor only the current cursor
+    is returned, for clients that have just loaded everything. When has_more is set
+    there are further changes to fetch straight away; when resync is set the cursor
+    is older than the retained log and the client must reload everything.
+
+    Changes younger than changelog.CHANGE_FEED_SETTLE_SECONDS are left for a later
+    poll, so the cursor never passes an entry whose transaction has yet to commit.
+    """
+    try:
+        logger.debug(f"User {current_user.username} requesting changes since {since} (limit={limit})")
+        
+        cutoff = changelog.settled_cutoff()
+        if since is None:
+            latest = db.scalar(select(func.max(models.ChangeLogEntry.id)))
+            if cutoff is not None:
+                unsettled = db.scalar(
+                    select(func.min(models.ChangeLogEntry.id)).where(models.ChangeLogEntry.date_created > cutoff)
+                )
+                if unsettled is not None:
+                    latest = unsettled - 1
+            return schemas.ChangeFeed(cursor=latest or 0)
+        
+        entries = db.execute(
+            select(
+                models.ChangeLogEntry.id,
+                models.ChangeLogEntry.entity_type,
+                models.ChangeLogEntry.entity_id,
+                models.ChangeLogEntry.action,
+                models.ChangeLogEntry.date_created
+            )
+            .where(models.ChangeLogEntry.id > since)
+            .order_by(models.ChangeLogEntry.id)
+            .limit(limit)
+        ).all()
+        if cutoff is not None:
+            # Stop at the first unsettled entry; everything after it waits for the next poll
+            for index, entry in enumerate(entries):
+                if to_utc(entry.date_created) > cutoff:
+                    logger.debug(f"Holding back change feed at entry {entry.id} until it settles")
+                    entries = entries[:index]
+                    break
+        if not entries:
+            return schemas.ChangeFeed(cursor=since)
+        
+        oldest = db.scalar(select(func.min(models.ChangeLogEntry.id)))
+        if since < oldest - 1:
+            logger.info(f"Change feed cursor {since} predates the retained log, client must resync")
+            return schemas.ChangeFeed(cursor=entries[-1].id, resync=True)
+        
+        # Only the latest action on each entity matters
+        latest_actions = {}
+        for entry in entries:
+            latest_actions[(entry.entity_type, entry.entity_id)] = entry.action
+        
+        changed = {entity_type: [] for entity_type in CHANGE_MODELS}
+        deleted = []
+        for (entity_type, entity_id), action in latest_actions.items():
+            if entity_type not in CHANGE_MODELS:
+                continue
+            if action == changelog.DELETED:
+                deleted.append({"entity_type": entity_type, "entity_id": entity_id})
+            else:
+                changed[entity_type].append(entity_id)
+        
+        loaded = {}
+        for entity_type, entity_ids in changed.items():
+            model = CHANGE_MODELS[entity_type]
+            query = db.query(model).filter(model.id.in_(entity_ids)).order_by(model.id)
+            if model is models.Job:
+                query = query.options(*job_load_options())
+            loaded[entity_type] = query.all() if entity_ids else []
+            # Entities deleted by a change beyond this page are reported as deleted now
+            found = {entity.id for entity in loaded[entity_type]}
+            deleted.extend(
+                {"entity_type": entity_type, "entity_id": entity_id}
+                for entity_id in entity_ids if entity_id not in found
+            )
+        
+        logger.debug(f"Returning {len(entries)} changes since {since}")
+        return schemas.ChangeFeed(
+            cursor=entries[-1].id,
+            has_more=len(entries) == limit,
+            jobs=loaded[changelog.JOB],
+            assets=loaded[changelog.ASSET],
+            customers=loaded[changelog.CUSTOMER],
+            deleted=deleted
+        )
+    except Exception as e:
+        logger.error(f"Error retrieving changes since {since}: {str(e)}")
+        raise
@@ -17,13 +17,17 @@ You should have received a copy of the GNU General Public License
 along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 '''
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 import schemas
 import models
-from database import get_db
+import changelog
+import etags
+import refdata
+from database import get_db, get_read_db
+from pagination import paginate, paginate_items, set_next_cursor
 from auth import get_current_active_user
 from logger_config import logger
 
@@ -51,7 +55,10 @@ def create_customer(
         # Create new customer
         db_customer = models.Customer(**customer.model_dump())
         db.add(db_customer)
+        db.flush()
+        changelog.record(db, changelog.CUSTOMER, [db_customer.id], changelog.CREATED)
         db.commit()
+        refdata.customers.invalidate()
         db.refresh(db_customer)
         
         logger.info(f"Customer created successfully: ID={db_customer.id}, Email={db_customer.email}")
@@ -65,15 +72,26 @@ def create_customer(
 
 @router.get("/", response_model=List[schemas.Customer])
 def read_customers(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all customers with pagination"""
+    """List all customers with pagination, by offset or by the cursor from the previous page"""
     try:
-        logger.debug(f"User {current_user.username} requesting customers list (skip={skip}, limit={limit})")
-        customers = db.query(models.Customer).offset(skip).limit(limit).all()
+        logger.debug(f"User {current_user.username} requesting customers list (skip={skip}, limit={limit}, cursor={cursor})")
+        not_modified = etags.check_not_modified(request, response, refdata.customers.etag(db))
+        if not_modified is not None:
+            return not_modified
+        cached = refdata.customers.items(db)
+        if cached is not None:
+            customers = paginate_items(cached, skip, limit, cursor)
+        else:
+            customers = paginate(db.query(models.Customer), models.Customer.id, skip, limit, cursor)
+        set_next_cursor(response, customers, limit)
         logger.debug(f"Retrieved {len(customers)} customers")
         return customers
     except Exception as e:
@@ -84,12 +102,12 @@ def read_customers(
 def read_customer(
     customer_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific customer by ID"""
     try:
         logger.debug(f"User {current_user.username} requesting customer ID={customer_id}")
-        customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
+        customer = refdata.customers.get(db, customer_id)
         if customer is None:
             logger.warning(f"Customer not found: ID={customer_id}")
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -123,7 +141,9 @@ def update_customer(
         for key, value in customer.model_dump().items():
             setattr(db_customer, key, value)
         
+        changelog.record(db, changelog.CUSTOMER, [customer_id])
         db.commit()
+        refdata.customers.invalidate()
         db.refresh(db_customer)
         
         logger.info(f"Customer ID={customer_id} updated successfully")
@@ -153,7 +173,9 @@ def delete_customer(
         # TODO: Add check for active jobs or other dependencies
         
         db.delete(customer)
+        changelog.record(db, changelog.CUSTOMER, [customer_id], changelog.DELETED)
         db.commit()
+        refdata.customers.invalidate()
         
         logger.info(f"Customer ID={customer_id} deleted successfully")
         return {"message": "Customer deleted successfully"}
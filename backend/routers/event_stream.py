@@ -0,0 +1,100 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import json
+import os
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+import events
+from auth import get_current_active_user, get_current_user, optional_oauth2_scheme
+from database import get_auth_db
+from logger_config import logger
+
+router = APIRouter(
+    prefix="/events",
+    tags=["Events"]
+)
+
+# A comment line is sent this often when there are no events, so proxies keep the connection open
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", 15))
+
+async def get_stream_user(
+    header_token: Optional[str] = Depends(optional_oauth2_scheme),
+    token: Optional[str] = Query(None, description="Access token, for clients that cannot send headers"),
+    db: Union[AsyncSession, Session] = Depends(get_auth_db)
+):
+    """
+    Authenticate from the Authorization header or, failing that, a token query
+    parameter. Browsers' EventSource cannot set headers, so this stream accepts
+    both; no other endpoint takes a token in the URL. logger_config masks the
+    token in uvicorn's access log; proxies in front of the API may still log it.
+    """
+    user = await get_current_user(header_token or token or "", db)
+    return await get_current_active_user(user)
+
+def format_event(event: dict) -> str:
+    """Format an event as a Server-Sent Events message"""
+    data = json.dumps(event["data"], separators=(",", ":"))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    asset_id: List[int] = Query([], description="Only events for jobs arriving at or leaving these assets"),
+    job_id: List[int] = Query([], description="Only events for these jobs"),
+    current_user: models.User = Depends(get_stream_user)
+):
+    """
+    Stream job movement and status events as Server-Sent Events, as they are committed.
+
+    Without filters every event is sent. A resync event means events were dropped
+    because the client fell behind; it should then reload what it shows, e.g. via
+    /changes/. Clients should also do so after reconnecting, since events published
+    while disconnected are not replayed.
+    """
+    subscription = events.broker.subscribe(asset_ids=asset_id, job_ids=job_id)
+    logger.info(
+        f"User {current_user.username} subscribed to events (assets={asset_id or 'all'}, jobs={job_id or 'all'})"
+    )
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = await subscription.get(EVENT_HEARTBEAT_SECONDS)
+                if event is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            events.broker.unsubscribe(subscription)
+            logger.info(f"User {current_user.username} unsubscribed from events")
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
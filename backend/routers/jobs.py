@@ -17,15 +17,26 @@ You should have received a copy of the GNU General Public License
 along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 '''
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import bindparam, insert, or_, select, update
+from typing import List, Optional
+from collections import defaultdict
+from datetime import datetime, timedelta
+import os
 import pytz
 
 import schemas
 import models
-from database import get_db
+import idempotency
+import changelog
+import events
+import etags
+import refdata
+import fastjson
+from cache import TTLCache
+from database import get_db, get_read_db
+from pagination import paginate, set_next_cursor
 from auth import get_current_active_user
 from logger_config import logger
 
@@ -34,13 +45,343 @@ router = APIRouter(
     tags=["Jobs"]
 )
 
+# Repeat moves of a job to the asset it arrived at within this many seconds are treated as duplicate scans
+SCAN_DEBOUNCE_SECONDS = float(os.getenv("SCAN_DEBOUNCE_SECONDS", 5))
+
+# Most recent move of each job, so duplicate scans can usually be answered without touching the database
+recent_scans = TTLCache(maxsize=int(os.getenv("SCAN_DEBOUNCE_CACHE_SIZE", 10000)), ttl=SCAN_DEBOUNCE_SECONDS)
+
 def get_current_time_utc() -> datetime:
     """Get current time in UTC"""
     return datetime.now(pytz.UTC)
 
+def to_utc(dt: datetime) -> datetime:
+    """Convert a datetime to UTC, treating naive values as already UTC"""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=pytz.UTC)
+    return dt.astimezone(pytz.UTC)
+
+# Sort keys accepted by read_jobs, and those that can be combined with a cursor (non-nullable)
+JOB_SORT_COLUMNS = {
+    "id": models.Job.id,
+    "name": models.Job.name,
+    "status": models.Job.status,
+    "date_created": models.Job.date_created,
+    "due_date": models.Job.due_date,
+}
+JOB_CURSOR_SORT_KEYS = ("id", "date_created")
+
+def job_load_options():
+    """Loader options so job responses fetch customers and locations in bulk rather than per job"""
+    return (
+        joinedload(models.Job.customer),
+        selectinload(models.Job.locations),
+    )
+
+# Column projections for serializing job responses without loading ORM objects
+JOB_NESTED_FIELDS = ("locations", "customer")
+JOB_PROJECTION = fastjson.Projection(schemas.JobWithCustomer, models.Job, nested=JOB_NESTED_FIELDS)
+JOB_SUMMARY_PROJECTION = fastjson.Projection(schemas.JobSummary, models.Job)
+LOCATION_PROJECTION = fastjson.Projection(schemas.JobLocation, models.JobLocation)
+
+def job_projection(fields: Optional[str], include: Optional[str]) -> Optional[fastjson.Projection]:
+    """The projection for a job request's ?fields= and ?include=, JOB_PROJECTION or None for the full job"""
+    projection = fastjson.sparse_projection(schemas.JobWithCustomer, models.Job, fields, include, JOB_NESTED_FIELDS)
+    if projection is None and fastjson.FAST_JSON_RESPONSES:
+        return JOB_PROJECTION
+    return projection
+
+def job_query_columns(projection: fastjson.Projection, *required) -> list:
+    """The projection's columns plus those project_jobs, sorting or cursors need to read"""
+    columns = list(projection.columns)
+    if "customer" in projection.fields:
+        required += (models.Job.customer_id,)
+    for column in (models.Job.id,) + required:
+        if column is not None and not any(column is selected for selected in columns):
+            columns.append(column)
+    return columns
+
+def project_jobs(db: Session, rows, projection: fastjson.Projection = JOB_PROJECTION) -> List[dict]:
+    """
+    Build job dicts for rows of the projection's columns. Locations, when included,
+    are fetched for every job in one query and customers come from the reference cache.
+    """
+    locations = defaultdict(list)
+    job_ids = [row.id for row in rows]
+    if job_ids and "locations" in projection.fields:
+        for location in db.execute(
+            select(*LOCATION_PROJECTION.columns)
+            .where(models.JobLocation.job_id.in_(job_ids))
+            .order_by(models.JobLocation.job_id, models.JobLocation.arrival_time, models.JobLocation.id)
+        ):
+            locations[location.job_id].append(LOCATION_PROJECTION.build(location))
+    customers = {}
+    if "customer" in projection.fields:
+        found = refdata.customers.get_many(db, {row.customer_id for row in rows})
+        customers = {customer_id: customer.model_dump(mode="json") for customer_id, customer in found.items()}
+    return [
+        projection.build(
+            row,
+            locations=locations[row.id],
+            customer=customers.get(row.customer_id) if "customer" in projection.nested else None
+        )
+        for row in rows
+    ]
+
+def find_duplicate_scan(
+    job_id: int,
+    asset_id: int,
+    moved_at: datetime,
+    current_location_id: Optional[int] = None,
+    current_asset_id: Optional[int] = None,
+    current_arrival_time: Optional[datetime] = None
+) -> Optional[dict]:
+    """
+    Return the earlier move if moving job_id to asset_id at moved_at would be a duplicate scan.
+
+    A move is a duplicate when the job arrived at the same asset less than
+    SCAN_DEBOUNCE_SECONDS earlier, according to recent_scans or, failing that,
+    the job's current location as read from the database.
+    """
+    debounce_window = timedelta(seconds=SCAN_DEBOUNCE_SECONDS)
+    recent = recent_scans.get(job_id)
+    if recent is not None and recent["asset_id"] == asset_id and moved_at - recent["arrival_time"] < debounce_window:
+        logger.debug(f"Debounced duplicate scan of job ID={job_id} at asset ID={asset_id} (cached)")
+        return {**recent, "debounced": True}
+    if (
+        current_asset_id == asset_id
+        and current_arrival_time is not None
+        and moved_at - to_utc(current_arrival_time) < debounce_window
+    ):
+        logger.debug(f"Debounced duplicate scan of job ID={job_id} at asset ID={asset_id}")
+        return {
+            "job_id": job_id,
+            "asset_id": asset_id,
+            "location_id": current_location_id,
+            "previous_asset_id": None,
+            "status": models.JobStatus.IN_PROGRESS,
+            "arrival_time": to_utc(current_arrival_time),
+            "debounced": True,
+        }
+    return None
+
+def apply_job_move(db: Session, job_id: int, asset_id: int, moved_at: datetime) -> dict:
+    """
+    Move a job to an asset within the caller's transaction, without committing.
+
+    This is the scanner hot path, so it uses Core statements rather than loading
+    ORM objects: one SELECT checks the job and asset together and reads the job's
+    current location, then the new location is inserted, the job is updated and
+    the previous location is closed.
+
+    Duplicate scans (see find_duplicate_scan) return the original move with
+    debounced set, without writing. Callers should pass successful results to
+    remember_scan once committed.
+    """
+    duplicate = find_duplicate_scan(job_id, asset_id, moved_at)
+    if duplicate is not None:
+        return duplicate
+    
+    asset_exists = (
+        select(models.Asset.id)
+        .where(models.Asset.id == asset_id)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        select(
+            models.Job.current_location_id,
+            models.Job.current_asset_id,
+            models.JobLocation.arrival_time,
+            asset_exists
+        )
+        .outerjoin(models.JobLocation, models.JobLocation.id == models.Job.current_location_id)
+        .where(models.Job.id == job_id)
+    ).first()
+    if row is None:
+        logger.warning(f"Job not found for move operation: ID={job_id}")
+        raise HTTPException(status_code=404, detail="Job not found")
+    previous_location_id, previous_asset_id, previous_arrival_time, found_asset_id = row
+    if found_asset_id is None:
+        logger.warning(f"Asset not found for move operation: ID={asset_id}")
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    duplicate = find_duplicate_scan(
+        job_id, asset_id, moved_at, previous_location_id, previous_asset_id, previous_arrival_time
+    )
+    if duplicate is not None:
+        return duplicate
+    
+    location_id = db.execute(
+        insert(models.JobLocation).values(job_id=job_id, asset_id=asset_id, arrival_time=moved_at)
+    ).inserted_primary_key[0]
+    
+    # Guard on the location we read so a concurrent move of the same job is detected rather than lost
+    updated = db.execute(
+        update(models.Job)
+        .where(
+            models.Job.id == job_id,
+            models.Job.current_location_id.is_(None) if previous_location_id is None
+            else models.Job.current_location_id == previous_location_id
+        )
+        .values(
+            status=models.JobStatus.IN_PROGRESS,
+            current_location_id=location_id,
+            current_asset_id=asset_id
+        )
+    ).rowcount
+    if updated != 1:
+        logger.warning(f"Concurrent move detected for job ID={job_id}")
+        raise HTTPException(status_code=409, detail="Job was moved concurrently, please retry")
+    
+    # Update departure time for the previous location unless the job stays at the same asset
+    if previous_location_id is not None and previous_asset_id != asset_id:
+        db.execute(
+            update(models.JobLocation)
+            .where(models.JobLocation.id == previous_location_id)
+            .values(departure_time=moved_at)
+        )
+    changelog.record(db, changelog.JOB, [job_id])
+    
+    return {
+        "job_id": job_id,
+        "asset_id": asset_id,
+        "location_id": location_id,
+        "previous_asset_id": previous_asset_id,
+        "status": models.JobStatus.IN_PROGRESS,
+        "arrival_time": moved_at,
+        "debounced": False,
+    }
+
+def apply_job_moves(db: Session, moves: List[schemas.JobMoveItem], moved_at: datetime) -> List[dict]:
+    """
+    Move many jobs within the caller's transaction, without committing.
+
+    Jobs and assets are validated with one query each, previous locations are
+    closed with one UPDATE, new locations are inserted with one multi-row INSERT
+    and the jobs are updated with one executemany, however many moves there are.
+    Returns one result per move, in order, with the HTTP status it would have had
+    as a single move and, when it succeeded, the move itself.
+    """
+    job_ids = {move.job_id for move in moves}
+    asset_ids = {move.asset_id for move in moves}
+    
+    current = {
+        row.id: row
+        for row in db.execute(
+            select(
+                models.Job.id,
+                models.Job.current_location_id,
+                models.Job.current_asset_id,
+                models.JobLocation.arrival_time
+            )
+            .outerjoin(models.JobLocation, models.JobLocation.id == models.Job.current_location_id)
+            .where(models.Job.id.in_(job_ids))
+        )
+    }
+    existing_assets = refdata.assets.existing(db, asset_ids)
+    
+    results = []
+    pending = []
+    seen_jobs = set()
+    for move in moves:
+        result = {"job_id": move.job_id, "asset_id": move.asset_id, "status_code": 200, "detail": None, "move": None}
+        results.append(result)
+        if move.job_id in seen_jobs:
+            result.update(status_code=400, detail="Job appears more than once in batch")
+            continue
+        seen_jobs.add(move.job_id)
+        if move.job_id not in current:
+            result.update(status_code=404, detail="Job not found")
+            continue
+        if move.asset_id not in existing_assets:
+            result.update(status_code=404, detail="Asset not found")
+            continue
+        row = current[move.job_id]
+        duplicate = find_duplicate_scan(
+            move.job_id, move.asset_id, moved_at, row.current_location_id, row.current_asset_id, row.arrival_time
+        )
+        if duplicate is not None:
+            result["move"] = duplicate
+            continue
+        pending.append((result, row))
+    
+    if not pending:
+        return results
+    order = {result["job_id"]: index for index, (result, row) in enumerate(pending)}
+    
+    # Close the previous locations of jobs that are changing asset
+    closing = [
+        row.current_location_id
+        for result, row in pending
+        if row.current_location_id is not None and row.current_asset_id != result["asset_id"]
+    ]
+    if closing:
+        db.execute(
+            update(models.JobLocation)
+            .where(models.JobLocation.id.in_(closing))
+            .values(departure_time=moved_at)
+        )
+    
+    # Each job appears once, so new locations can be matched up by job without ordered RETURNING
+    inserted = db.execute(
+        insert(models.JobLocation).returning(models.JobLocation.job_id, models.JobLocation.id),
+        [
+            {"job_id": result["job_id"], "asset_id": result["asset_id"], "arrival_time": moved_at}
+            for result, row in pending
+        ]
+    )
+    location_ids = [location_id for job_id, location_id in sorted(inserted, key=lambda row: order[row[0]])]
+    
+    # Guard on the locations we read so concurrent moves of the same jobs are detected rather than lost
+    jobs_table = models.Job.__table__
+    updated = db.connection().execute(
+        update(jobs_table)
+        .where(
+            jobs_table.c.id == bindparam("b_job_id"),
+            jobs_table.c.current_location_id.is_not_distinct_from(bindparam("b_previous_location_id"))
+        )
+        .values(
+            status=models.JobStatus.IN_PROGRESS,
+            current_location_id=bindparam("b_location_id"),
+            current_asset_id=bindparam("b_asset_id")
+        ),
+        [
+            {
+                "b_job_id": result["job_id"],
+                "b_previous_location_id": row.current_location_id,
+                "b_location_id": location_id,
+                "b_asset_id": result["asset_id"],
+            }
+            for (result, row), location_id in zip(pending, location_ids)
+        ]
+    ).rowcount
+    if updated != len(pending):
+        logger.warning("Concurrent move detected during batch move")
+        raise HTTPException(status_code=409, detail="Jobs were moved concurrently, please retry")
+    changelog.record(db, changelog.JOB, [result["job_id"] for result, row in pending])
+    
+    for (result, row), location_id in zip(pending, location_ids):
+        result["move"] = {
+            "job_id": result["job_id"],
+            "asset_id": result["asset_id"],
+            "location_id": location_id,
+            "previous_asset_id": row.current_asset_id,
+            "status": models.JobStatus.IN_PROGRESS,
+            "arrival_time": moved_at,
+            "debounced": False,
+        }
+    return results
+
+def remember_scan(result: dict) -> None:
+    """Record a committed move so duplicate scans of it can be debounced from memory"""
+    if SCAN_DEBOUNCE_SECONDS > 0 and not result["debounced"]:
+        recent_scans.set(result["job_id"], result)
+
 @router.post("/", response_model=schemas.Job)
 def create_job(
     job: schemas.JobCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Depends(idempotency.get_idempotency_key),
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -48,8 +389,12 @@ def create_job(
     try:
         logger.info(f"User {current_user.username} creating new job for customer ID={job.customer_id}")
         
+        replay = idempotency.lookup(db, current_user, idempotency_key, request)
+        if replay is not None:
+            return replay
+        
         # Verify customer exists
-        customer = db.query(models.Customer).filter(models.Customer.id == job.customer_id).first()
+        customer = refdata.customers.get(db, job.customer_id)
         if not customer:
             logger.warning(f"Job creation failed: Customer not found - ID={job.customer_id}")
             raise HTTPException(status_code=404, detail="Customer not found")
@@ -57,11 +402,17 @@ def create_job(
         # Create job
         db_job = models.Job(**job.model_dump())
         db.add(db_job)
-        db.commit()
+        db.flush()
+        changelog.record(db, changelog.JOB, [db_job.id], changelog.CREATED)
+        # Respond with the job as stored, not as submitted
         db.refresh(db_job)
+        result = schemas.Job.model_validate(db_job)
+        replay = idempotency.commit(db, current_user, idempotency_key, request, result)
+        if replay is not None:
+            return replay
         
-        logger.info(f"Job created successfully: ID={db_job.id}, Customer={customer.name}, Status={db_job.status}")
-        return db_job
+        logger.info(f"Job created successfully: ID={result.id}, Customer={customer.name}, Status={result.status}")
+        return result
     except HTTPException:
         raise
     except Exception as e:
@@ -69,36 +420,433 @@ def create_job(
         db.rollback()
         raise
 
+@router.post("/batch_move", response_model=schemas.JobBatchMoveResult)
+def batch_move_jobs(
+    batch: schemas.JobBatchMove,
+    request: Request,
+    idempotency_key: Optional[str] = Depends(idempotency.get_idempotency_key),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Move many jobs to assets in a single transaction, reporting the outcome of each move"""
+    try:
+        logger.info(f"User {current_user.username} moving {len(batch.moves)} jobs in a batch")
+        
+        replay = idempotency.lookup(db, current_user, idempotency_key, request)
+        if replay is not None:
+            return replay
+        
+        results = apply_job_moves(db, batch.moves, get_current_time_utc())
+        result = schemas.JobBatchMoveResult(results=results)
+        replay = idempotency.commit(db, current_user, idempotency_key, request, result)
+        if replay is not None:
+            return replay
+        for item in results:
+            if item["move"] is not None:
+                remember_scan(item["move"])
+                if not item["move"]["debounced"]:
+                    events.broker.publish(events.JOB_MOVED, schemas.JobMove(**item["move"]).model_dump(mode="json"))
+        
+        moved = sum(1 for item in results if item["move"] is not None and not item["move"]["debounced"])
+        logger.info(f"Batch move completed: {moved} of {len(results)} jobs moved")
+        return result
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        logger.error(f"Error during batch move: {str(e)}")
+        db.rollback()
+        raise
+
+# Scan events timestamped further than this into the future are rejected as clock errors
+SCAN_EVENT_MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+def apply_scan_events(db: Session, events: List[schemas.ScanEvent], received_at: datetime) -> List[dict]:
+    """
+    Apply scan events recorded by clients, in time order, within the caller's transaction.
+
+    Each event is slotted into the job's location history at its scanned_at time
+    rather than appended at the time it was received: the location the job was at
+    then is ended at scanned_at, and the new location lasts until the job's next
+    recorded arrival, or stays open if there is none. A scan of a job at the asset
+    it was already at is a duplicate and is not written, and a scan directly before
+    or after a stay at the same asset extends that stay rather than adding a row.
+    Jobs, assets and the relevant history are each loaded with one query and all
+    writes are flushed together.
+
+    Each job's current location is then set with the same compare-and-set as
+    apply_job_move, so a move committed meanwhile raises a 409 rather than being
+    overwritten. Returns one result per event, in the order given.
+    """
+    job_ids = {event.job_id for event in events}
+    asset_ids = {event.asset_id for event in events}
+    earliest = min(to_utc(event.scanned_at) for event in events)
+    
+    # The current location each job had when read, for the compare-and-set below
+    read_locations = dict(
+        db.execute(
+            select(models.Job.id, models.Job.current_location_id).where(models.Job.id.in_(job_ids))
+        ).all()
+    )
+    existing_assets = refdata.assets.existing(db, asset_ids)
+    
+    # Only locations that had not ended before the earliest event can be affected
+    timelines = {job_id: [] for job_id in read_locations}
+    for location in (
+        db.query(models.JobLocation)
+        .filter(
+            models.JobLocation.job_id.in_(read_locations.keys()),
+            or_(
+                models.JobLocation.departure_time.is_(None),
+                models.JobLocation.departure_time >= earliest
+            )
+        )
+        .order_by(models.JobLocation.job_id, models.JobLocation.arrival_time)
+    ):
+        timelines[location.job_id].append(location)
+    
+    results = [
+        {**event.model_dump(), "scanned_at": to_utc(event.scanned_at), "status_code": 200, "detail": None, "location_id": None}
+        for event in events
+    ]
+    # Locations the events resolved to, whose IDs are only known once flushed
+    located = []
+    # Locations absorbed into the stay before them, and the stay they became part of
+    merged = {}
+    changed_jobs = set()
+    for index in sorted(range(len(events)), key=lambda i: to_utc(events[i].scanned_at)):
+        event, result = events[index], results[index]
+        scanned_at = to_utc(event.scanned_at)
+        if event.job_id not in read_locations:
+            result.update(status_code=404, detail="Job not found")
+            continue
+        if event.asset_id not in existing_assets:
+            result.update(status_code=404, detail="Asset not found")
+            continue
+        if scanned_at > received_at + SCAN_EVENT_MAX_CLOCK_SKEW:
+            result.update(status_code=400, detail="scanned_at is in the future")
+            continue
+        
+        timeline = timelines[event.job_id]
+        position = sum(1 for location in timeline if to_utc(location.arrival_time) <= scanned_at)
+        previous = timeline[position - 1] if position > 0 else None
+        following = timeline[position] if position < len(timeline) else None
+        
+        if (
+            previous is not None
+            and previous.asset_id == event.asset_id
+            and (previous.departure_time is None or to_utc(previous.departure_time) > scanned_at)
+        ):
+            logger.debug(f"Scan event for job ID={event.job_id} at asset ID={event.asset_id} is a duplicate")
+            located.append((previous, result))
+            continue
+        
+        departure_time = None
+        if previous is not None and (previous.departure_time is None or to_utc(previous.departure_time) > scanned_at):
+            # The job was at another asset at scanned_at, so it left there when scanned here
+            departure_time = previous.departure_time
+            previous.departure_time = scanned_at
+        elif following is not None:
+            departure_time = following.arrival_time
+        changed_jobs.add(event.job_id)
+        
+        # The new stay runs straight into a stay at the same asset: that stay started earlier
+        if (
+            following is not None
+            and following.asset_id == event.asset_id
+            and departure_time is not None
+            and to_utc(departure_time) == to_utc(following.arrival_time)
+        ):
+            following.arrival_time = scanned_at
+            location = following
+        else:
+            location = None
+        
+        # The new stay starts as a stay at the same asset ends: that stay lasted longer
+        if (
+            previous is not None
+            and previous.asset_id == event.asset_id
+            and previous.departure_time is not None
+            and to_utc(previous.departure_time) == scanned_at
+        ):
+            if location is not None:
+                # Both neighbours are at this asset, so they become one stay
+                previous.departure_time = following.departure_time
+                timeline.remove(following)
+                merged[following] = previous
+            else:
+                previous.departure_time = departure_time
+            location = previous
+        
+        if location is None:
+            location = models.JobLocation(
+                job_id=event.job_id,
+                asset_id=event.asset_id,
+                arrival_time=scanned_at,
+                departure_time=departure_time
+            )
+            db.add(location)
+            timeline.insert(position, location)
+        located.append((location, result))
+    
+    db.flush()
+    
+    # The job's current location is its open location, if it has one
+    for job_id in sorted(changed_jobs):
+        timeline = timelines[job_id]
+        current = next((location for location in reversed(timeline) if location.departure_time is None), None)
+        read_location_id = read_locations[job_id]
+        values = {
+            "current_location_id": None if current is None else current.id,
+            "current_asset_id": None if current is None else current.asset_id,
+        }
+        if current is not None and current.id != read_location_id:
+            values["status"] = models.JobStatus.IN_PROGRESS
+        # Guard on the location read at the start, as apply_job_move does
+        updated = db.execute(
+            update(models.Job)
+            .where(
+                models.Job.id == job_id,
+                models.Job.current_location_id.is_(None) if read_location_id is None
+                else models.Job.current_location_id == read_location_id
+            )
+            .values(**values)
+        ).rowcount
+        if updated != 1:
+            logger.warning(f"Concurrent move detected for job ID={job_id} while applying scan events")
+            raise HTTPException(status_code=409, detail="Job was moved concurrently, please retry")
+    
+    # Merged stays are removed once no job refers to them as its current location
+    for location in merged:
+        db.delete(location)
+    db.flush()
+    
+    changelog.record(db, changelog.JOB, sorted(changed_jobs))
+    for location, result in located:
+        while location in merged:
+            location = merged[location]
+        result["location_id"] = location.id
+    return results
+
+@router.post("/scan_events", response_model=schemas.ScanEventBatchResult)
+def ingest_scan_events(
+    batch: schemas.ScanEventBatch,
+    request: Request,
+    idempotency_key: Optional[str] = Depends(idempotency.get_idempotency_key),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Apply a batch of scans recorded offline, slotting each into job history at the time it was scanned"""
+    try:
+        devices = sorted({event.device_id for event in batch.events})
+        logger.info(f"User {current_user.username} syncing {len(batch.events)} scan events from devices {devices}")
+        
+        replay = idempotency.lookup(db, current_user, idempotency_key, request)
+        if replay is not None:
+            return replay
+        
+        results = apply_scan_events(db, batch.events, get_current_time_utc())
+        result = schemas.ScanEventBatchResult(results=results)
+        replay = idempotency.commit(db, current_user, idempotency_key, request, result)
+        if replay is not None:
+            return replay
+        for event in batch.events:
+            recent_scans.pop(event.job_id)
+        for item in result.results:
+            if item.status_code == 200:
+                events.broker.publish(events.JOB_SCANNED, item.model_dump(mode="json"))
+        
+        applied = sum(1 for item in results if item["status_code"] == 200)
+        logger.info(f"Scan event sync completed: {applied} of {len(results)} events applied")
+        return result
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        logger.error(f"Error applying scan events: {str(e)}")
+        db.rollback()
+        raise
+
 @router.get("/", response_model=List[schemas.JobWithCustomer])
 def read_jobs(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    status: Optional[models.JobStatus] = None,
+    customer_id: Optional[int] = None,
+    asset_id: Optional[int] = Query(None, description="Only jobs currently at this asset"),
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    sort: str = Query("id", description="Sort key, prefix with '-' for descending"),
+    fields: Optional[str] = Query(None, description="Comma-separated job fields to return; id is always included"),
+    include: Optional[str] = Query(None, description="Comma-separated nested fields to embed: locations, customer"),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all jobs with pagination"""
+    """
+    List jobs matching the given filters, by offset or by the cursor from the previous page.
+
+    With fields or include only the requested fields are returned, and only the
+    columns and relationships they need are loaded.
+    """
     try:
-        logger.debug(f"User {current_user.username} requesting jobs list (skip={skip}, limit={limit})")
-        jobs = db.query(models.Job).offset(skip).limit(limit).all()
+        logger.debug(
+            f"User {current_user.username} requesting jobs list (skip={skip}, limit={limit}, cursor={cursor}, "
+            f"status={status}, customer_id={customer_id}, asset_id={asset_id}, due_after={due_after}, "
+            f"due_before={due_before}, created_after={created_after}, created_before={created_before}, sort={sort}, "
+            f"fields={fields}, include={include})"
+        )
+        
+        descending = sort.startswith("-")
+        sort_key = sort.lstrip("-")
+        if sort_key not in JOB_SORT_COLUMNS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid sort key, expected one of: {', '.join(JOB_SORT_COLUMNS)}"
+            )
+        sort_column = JOB_SORT_COLUMNS[sort_key]
+        if cursor is not None and sort_key not in JOB_CURSOR_SORT_KEYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cursor pagination is only supported when sorting by: {', '.join(JOB_CURSOR_SORT_KEYS)}"
+            )
+        projection = job_projection(fields, include)
+        
+        # Job responses embed the customer, so customer changes count too
+        etag = etags.compute_etag(db, (changelog.JOB, None), (changelog.CUSTOMER, None))
+        not_modified = etags.check_not_modified(request, response, etag)
+        if not_modified is not None:
+            return not_modified
+        
+        if projection is not None:
+            cursor_column = sort_column if sort_key in JOB_CURSOR_SORT_KEYS else None
+            query = db.query(*job_query_columns(projection, cursor_column))
+        else:
+            query = db.query(models.Job).options(*job_load_options())
+        if status is not None:
+            query = query.filter(models.Job.status == status)
+        if customer_id is not None:
+            query = query.filter(models.Job.customer_id == customer_id)
+        if due_after is not None:
+            query = query.filter(models.Job.due_date >= to_utc(due_after))
+        if due_before is not None:
+            query = query.filter(models.Job.due_date <= to_utc(due_before))
+        if created_after is not None:
+            query = query.filter(models.Job.date_created >= to_utc(created_after))
+        if created_before is not None:
+            query = query.filter(models.Job.date_created <= to_utc(created_before))
+        if asset_id is not None:
+            query = query.filter(models.Job.current_asset_id == asset_id)
+        
+        sort_column = None if sort_key == "id" else sort_column
+        jobs = paginate(query, models.Job.id, skip, limit, cursor, sort_column, descending)
+        if sort_key in JOB_CURSOR_SORT_KEYS:
+            set_next_cursor(response, jobs, limit, sort_column)
         logger.debug(f"Retrieved {len(jobs)} jobs")
+        if projection is not None:
+            return fastjson.respond(project_jobs(db, jobs, projection), response)
         return jobs
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving jobs list: {str(e)}")
         raise
 
+@router.get("/timeline", response_model=schemas.JobTimeline)
+def read_jobs_timeline(
+    response: Response,
+    ids: str = Query(..., description="Comma-separated job IDs"),
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get jobs, their location history within a time window and the assets visited, in one response"""
+    try:
+        try:
+            job_ids = sorted({int(job_id) for job_id in ids.split(",") if job_id.strip()})
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be a comma-separated list of job IDs")
+        
+        logger.debug(f"User {current_user.username} requesting timeline for jobs {job_ids} (from={from_time}, to={to_time})")
+        
+        fast = fastjson.FAST_JSON_RESPONSES
+        jobs = (
+            db.query(*JOB_SUMMARY_PROJECTION.columns) if fast else db.query(models.Job)
+        ).filter(models.Job.id.in_(job_ids)).order_by(models.Job.id).all()
+        
+        # Locations overlapping the window: arrived before it ends and not departed before it starts
+        locations_query = (
+            db.query(*LOCATION_PROJECTION.columns) if fast else db.query(models.JobLocation)
+        ).filter(models.JobLocation.job_id.in_(job_ids))
+        if to_time is not None:
+            locations_query = locations_query.filter(models.JobLocation.arrival_time <= to_utc(to_time))
+        if from_time is not None:
+            locations_query = locations_query.filter(
+                or_(
+                    models.JobLocation.departure_time.is_(None),
+                    models.JobLocation.departure_time >= to_utc(from_time)
+                )
+            )
+        locations = locations_query.order_by(models.JobLocation.job_id, models.JobLocation.arrival_time).all()
+        
+        # Each asset is returned once, however many locations reference it
+        asset_ids = {location.asset_id for location in locations}
+        if fast:
+            found = refdata.assets.get_many(db, asset_ids)
+            assets = [found[asset_id].model_dump(mode="json") for asset_id in sorted(found)]
+            logger.debug(f"Retrieved timeline with {len(jobs)} jobs, {len(locations)} locations and {len(assets)} assets")
+            return fastjson.respond({
+                "jobs": [JOB_SUMMARY_PROJECTION.build(job) for job in jobs],
+                "locations": [LOCATION_PROJECTION.build(location) for location in locations],
+                "assets": assets,
+            }, response)
+        assets = (
+            db.query(models.Asset)
+            .filter(models.Asset.id.in_(asset_ids))
+            .order_by(models.Asset.id)
+            .all()
+        ) if asset_ids else []
+        
+        logger.debug(f"Retrieved timeline with {len(jobs)} jobs, {len(locations)} locations and {len(assets)} assets")
+        return schemas.JobTimeline(jobs=jobs, locations=locations, assets=assets)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving jobs timeline: {str(e)}")
+        raise
+
 @router.get("/{job_id}", response_model=schemas.JobWithCustomer)
 def read_job(
     job_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated job fields to return; id is always included"),
+    include: Optional[str] = Query(None, description="Comma-separated nested fields to embed: locations, customer"),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get a specific job by ID"""
+    """Get a specific job by ID, optionally only the requested fields"""
     try:
-        logger.debug(f"User {current_user.username} requesting job ID={job_id}")
-        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        logger.debug(f"User {current_user.username} requesting job ID={job_id} (fields={fields}, include={include})")
+        projection = fastjson.sparse_projection(schemas.JobWithCustomer, models.Job, fields, include, JOB_NESTED_FIELDS)
+        etag = etags.compute_etag(db, (changelog.JOB, job_id), (changelog.CUSTOMER, None))
+        not_modified = etags.check_not_modified(request, response, etag)
+        if not_modified is not None:
+            return not_modified
+        if projection is not None:
+            job = db.query(*job_query_columns(projection)).filter(models.Job.id == job_id).first()
+        else:
+            job = db.query(models.Job).options(*job_load_options()).filter(models.Job.id == job_id).first()
         if job is None:
             logger.warning(f"Job not found: ID={job_id}")
             raise HTTPException(status_code=404, detail="Job not found")
+        if projection is not None:
+            return fastjson.respond(project_jobs(db, [job], projection)[0], response)
         return job
     except HTTPException:
         raise
@@ -106,10 +854,12 @@ def read_job(
         logger.error(f"Error retrieving job ID={job_id}: {str(e)}")
         raise
 
-@router.post("/{job_id}/move", response_model=schemas.Job)
+@router.post("/{job_id}/move", response_model=schemas.JobMove)
 def move_job_to_asset(
     job_id: int,
     asset_id: int,
+    request: Request,
+    idempotency_key: Optional[str] = Depends(idempotency.get_idempotency_key),
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -117,46 +867,25 @@ def move_job_to_asset(
     try:
         logger.info(f"User {current_user.username} moving job ID={job_id} to asset ID={asset_id}")
         
-        # Verify job exists
-        job = db.query(models.Job).filter(models.Job.id == job_id).first()
-        if not job:
-            logger.warning(f"Job not found for move operation: ID={job_id}")
-            raise HTTPException(status_code=404, detail="Job not found")
-        
-        # Verify asset exists
-        asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
-        if not asset:
-            logger.warning(f"Asset not found for move operation: ID={asset_id}")
-            raise HTTPException(status_code=404, detail="Asset not found")
-        
-        # Update departure time for current location if exists
-        current_location = (
-            db.query(models.JobLocation)
-            .filter(models.JobLocation.job_id == job_id)
-            .order_by(models.JobLocation.arrival_time.desc())
-            .first()
-        )
-        
-        if current_location and current_location.asset_id != asset_id:
-            current_location.departure_time = get_current_time_utc()
-            
-        # Create new location record
-        new_location = models.JobLocation(
-            job_id=job_id,
-            asset_id=asset_id,
-            arrival_time=get_current_time_utc()
-        )
-        db.add(new_location)
-        
-        # Update job status to in_progress when moved to an asset
-        job.status = models.JobStatus.IN_PROGRESS
+        replay = idempotency.lookup(db, current_user, idempotency_key, request)
+        if replay is not None:
+            return replay
         
-        db.commit()
-        db.refresh(job)
+        result = apply_job_move(db, job_id, asset_id, get_current_time_utc())
+        if result["debounced"]:
+            logger.info(f"Job ID={job_id} already at asset ID={asset_id}, duplicate scan ignored")
+            return result
+        move = schemas.JobMove(**result)
+        replay = idempotency.commit(db, current_user, idempotency_key, request, move)
+        if replay is not None:
+            return replay
+        remember_scan(result)
+        events.broker.publish(events.JOB_MOVED, move.model_dump(mode="json"))
         
         logger.info(f"Job ID={job_id} successfully moved to asset ID={asset_id}")
-        return job
+        return result
     except HTTPException:
+        db.rollback()
         raise
     except Exception as e:
         logger.error(f"Error moving job ID={job_id} to asset ID={asset_id}: {str(e)}")
@@ -167,6 +896,8 @@ def move_job_to_asset(
 def update_job_status(
     job_id: int,
     status: models.JobStatus,
+    request: Request,
+    idempotency_key: Optional[str] = Depends(idempotency.get_idempotency_key),
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -174,59 +905,58 @@ def update_job_status(
     try:
         logger.info(f"User {current_user.username} updating status of job ID={job_id} to {status}")
         
+        replay = idempotency.lookup(db, current_user, idempotency_key, request)
+        if replay is not None:
+            return replay
+        
         job = db.query(models.Job).filter(models.Job.id == job_id).first()
         if not job:
             logger.warning(f"Job not found for status update: ID={job_id}")
             raise HTTPException(status_code=404, detail="Job not found")
         
         old_status = job.status
+        previous_asset_id = job.current_asset_id
         
-        # If marking as complete, ensure all locations have departure times
-        if status == models.JobStatus.COMPLETE:
-            # First try to find current location (where departure_time is NULL)
-            current_location = (
-                db.query(models.JobLocation)
-                .filter(
-                    models.JobLocation.job_id == job_id,
-                    models.JobLocation.departure_time.is_(None)
-                )
-                .first()
-            )
-            
-            # If no current location found, get the last location
-            if not current_location:
-                current_location = (
-                    db.query(models.JobLocation)
-                    .filter(models.JobLocation.job_id == job_id)
-                    .order_by(models.JobLocation.arrival_time.desc())
-                    .first()
-                )
-            
-            # Set departure time if we found a location and it doesn't already have one
-            if current_location and current_location.departure_time is None:
-                logger.debug(f"Setting departure time for completed job ID={job_id} from asset ID={current_location.asset_id}")
-                current_location.departure_time = get_current_time_utc()
-        
-        # If marking as pending, ensure job is not at any location
-        if status == models.JobStatus.PENDING:
-            current_location = (
+        # If marking as complete or pending, ensure the job is not left at any location
+        if status in (models.JobStatus.COMPLETE, models.JobStatus.PENDING):
+            if job.current_asset_id is not None:
+                logger.debug(f"Setting departure time for {status.value} job ID={job_id} from asset ID={job.current_asset_id}")
+            (
                 db.query(models.JobLocation)
                 .filter(
                     models.JobLocation.job_id == job_id,
                     models.JobLocation.departure_time.is_(None)
                 )
-                .first()
+                .update({models.JobLocation.departure_time: get_current_time_utc()}, synchronize_session=False)
             )
-            if current_location:
-                logger.debug(f"Setting departure time for pending job ID={job_id} from asset ID={current_location.asset_id}")
-                current_location.departure_time = get_current_time_utc()
+            job.current_location_id = None
+            job.current_asset_id = None
         
         job.status = status
-        db.commit()
-        db.refresh(job)
+        db.flush()
+        changelog.record(db, changelog.JOB, [job_id])
+        job = (
+            db.query(models.Job)
+            .options(*job_load_options())
+            .populate_existing()
+            .filter(models.Job.id == job_id)
+            .one()
+        )
+        result = schemas.Job.model_validate(job)
+        replay = idempotency.commit(db, current_user, idempotency_key, request, result)
+        if replay is not None:
+            return replay
+        recent_scans.pop(job_id)
+        events.broker.publish(events.JOB_STATUS, {
+            "job_id": job_id,
+            "status": result.status.value,
+            "previous_status": old_status.value if old_status is not None else None,
+            "asset_id": result.current_asset_id,
+            "previous_asset_id": previous_asset_id,
+        })
         
         logger.info(f"Job ID={job_id} status updated: {old_status} -> {status}")
-        return job
+        return result
     except HTTPException:
         raise
     except Exception as e:
@@ -237,26 +967,33 @@ def update_job_status(
 @router.get("/{job_id}/location_history", response_model=List[schemas.JobLocation])
 def get_job_location_history(
     job_id: int,
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get the complete location history of a job"""
     try:
         logger.debug(f"User {current_user.username} requesting location history for job ID={job_id}")
         
-        job = db.query(models.Job).filter(models.Job.id == job_id).first()
+        # A job that does not exist has no current version for a client to hold
+        job = db.query(models.Job.id).filter(models.Job.id == job_id).first()
         if not job:
             logger.warning(f"Job not found for location history: ID={job_id}")
             raise HTTPException(status_code=404, detail="Job not found")
         
+        not_modified = etags.check_not_modified(request, response, etags.compute_etag(db, (changelog.JOB, job_id)))
+        if not_modified is not None:
+            return not_modified
+        
+        fast = fastjson.FAST_JSON_RESPONSES
         locations = (
-            db.query(models.JobLocation)
-            .filter(models.JobLocation.job_id == job_id)
-            .order_by(models.JobLocation.arrival_time)
-            .all()
-        )
+            db.query(*LOCATION_PROJECTION.columns) if fast else db.query(models.JobLocation)
+        ).filter(models.JobLocation.job_id == job_id).order_by(models.JobLocation.arrival_time).all()
         
         logger.debug(f"Retrieved {len(locations)} location records for job ID={job_id}")
+        if fast:
+            return fastjson.respond([LOCATION_PROJECTION.build(location) for location in locations], response)
         return locations
     except HTTPException:
         raise
@@ -5,16 +5,14 @@ This module handles frontend and scanner log collection and storage.
 """
 
 import logging
-from logging.handlers import RotatingFileHandler
 import os
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
-from sqlalchemy.orm import Session
 
-from database import get_db
 from auth import get_current_active_user
+from logger_config import BatchRotatingFileHandler, QueuedLogHandler, log_writer
 import models
 
 # Ensure logs directory exists
@@ -24,8 +22,8 @@ os.makedirs('logs', exist_ok=True)
 frontend_logger = logging.getLogger('frontend')
 frontend_logger.setLevel(logging.DEBUG)
 
-# Configure rotating file handler for frontend logs
-frontend_handler = RotatingFileHandler(
+# Configure rotating file handler for frontend logs, written by the background log writer
+frontend_handler = BatchRotatingFileHandler(
     filename='logs/frontend.log',
     maxBytes=10 * 1024 * 1024,  # 10MB per file
     backupCount=5,  # Keep 5 backup files
@@ -34,14 +32,14 @@ frontend_handler = RotatingFileHandler(
 frontend_handler.setFormatter(
     logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 )
-frontend_logger.addHandler(frontend_handler)
+frontend_logger.addHandler(QueuedLogHandler(log_writer, frontend_handler))
 
 # Setup logger for scanner logs
 scanner_logger = logging.getLogger('scanner')
 scanner_logger.setLevel(logging.DEBUG)
 
-# Configure rotating file handler for scanner logs
-scanner_handler = RotatingFileHandler(
+# Configure rotating file handler for scanner logs, written by the background log writer
+scanner_handler = BatchRotatingFileHandler(
     filename='logs/scanner.log',
     maxBytes=10 * 1024 * 1024,  # 10MB per file
     backupCount=5,  # Keep 5 backup files
@@ -50,7 +48,7 @@ scanner_handler = RotatingFileHandler(
 scanner_handler.setFormatter(
     logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 )
-scanner_logger.addHandler(scanner_handler)
+scanner_logger.addHandler(QueuedLogHandler(log_writer, scanner_handler))
 
 router = APIRouter(
     prefix="/logs",
@@ -69,8 +67,7 @@ class LogBatch(BaseModel):
 @router.post("/frontend")
 async def store_frontend_logs(
     log_batch: LogBatch,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_active_user)
 ):
     """Store frontend logs in rotating log files."""
     for log in log_batch.logs:
@@ -102,8 +99,7 @@ async def store_frontend_logs(
 @router.post("/scanner")
 async def store_scanner_logs(
     log_batch: LogBatch,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_active_user)
 ):
     """Store scanner logs in rotating log files."""
     for log in log_batch.logs:
@@ -17,18 +17,19 @@ You should have received a copy of the GNU General Public License
 along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 '''
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import timedelta
 
 import schemas
 import models
-from database import get_db
+from database import get_db, get_read_db
+from pagination import paginate, set_next_cursor
 from auth import (
     get_current_active_user,
-    get_password_hash,
+    get_password_hash_bounded,
     authenticate_user,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
@@ -56,7 +57,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Username already taken")
         
         # Create new user
-        hashed_password = get_password_hash(user.password)
+        hashed_password = get_password_hash_bounded(user.password)
         db_user = models.User(
             email=user.email,
             username=user.username,
@@ -81,14 +82,17 @@ def read_users_me(current_user: models.User = Depends(get_current_active_user)):
 
 @router.get("/", response_model=List[schemas.User])
 def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     try:
-        users = db.query(models.User).offset(skip).limit(limit).all()
-        logger.info(f"User list retrieved by {current_user.username} (skip={skip}, limit={limit})")
+        users = paginate(db.query(models.User), models.User.id, skip, limit, cursor)
+        set_next_cursor(response, users, limit)
+        logger.info(f"User list retrieved by {current_user.username} (skip={skip}, limit={limit}, cursor={cursor})")
         return users
     except Exception as e:
         logger.error(f"Error retrieving user list: {str(e)}")
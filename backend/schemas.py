@@ -123,6 +123,8 @@ class Job(JobBase):
     id: int
     status: JobStatus
     date_created: datetime
+    current_location_id: Optional[int] = None
+    current_asset_id: Optional[int] = None
     locations: List[JobLocation] = []
 
     class Config:
@@ -139,3 +141,112 @@ class JobWithCustomer(Job):
         json_encoders = {
             datetime: format_datetime
         }
+
+class JobMove(BaseModel):
+    job_id: int
+    asset_id: int
+    location_id: int
+    previous_asset_id: Optional[int] = None
+    status: JobStatus
+    arrival_time: datetime
+    debounced: bool = False
+
+    class Config:
+        json_encoders = {
+            datetime: format_datetime
+        }
+
+class JobMoveItem(BaseModel):
+    job_id: int
+    asset_id: int
+
+class JobBatchMove(BaseModel):
+    moves: List[JobMoveItem] = Field(..., min_length=1, max_length=500)
+
+class JobBatchMoveItemResult(JobMoveItem):
+    status_code: int
+    detail: Optional[str] = None
+    move: Optional[JobMove] = None
+
+class JobBatchMoveResult(BaseModel):
+    results: List[JobBatchMoveItemResult]
+
+    class Config:
+        json_encoders = {
+            datetime: format_datetime
+        }
+
+class ScanEvent(JobMoveItem):
+    scanned_at: datetime
+    device_id: str
+
+class ScanEventBatch(BaseModel):
+    events: List[ScanEvent] = Field(..., min_length=1, max_length=1000)
+
+class ScanEventResult(ScanEvent):
+    status_code: int
+    detail: Optional[str] = None
+    location_id: Optional[int] = None
+
+    class Config:
+        json_encoders = {
+            datetime: format_datetime
+        }
+
+class ScanEventBatchResult(BaseModel):
+    results: List[ScanEventResult]
+
+    class Config:
+        json_encoders = {
+            datetime: format_datetime
+        }
+
+class JobSummary(JobBase):
+    id: int
+    status: JobStatus
+    date_created: datetime
+    current_location_id: Optional[int] = None
+    current_asset_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: format_datetime
+        }
+
+class JobTimeline(BaseModel):
+    jobs: List[JobSummary] = []
+    locations: List[JobLocation] = []
+    assets: List[Asset] = []
+
+    class Config:
+        json_encoders = {
+            datetime: format_datetime
+        }
+
+class AssetWithCurrentJobs(Asset):
+    current_jobs: List[Job] = []
+
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: format_datetime
+        }
+
+class DeletedEntity(BaseModel):
+    entity_type: str
+    entity_id: int
+
+class ChangeFeed(BaseModel):
+    cursor: int
+    has_more: bool = False
+    resync: bool = False
+    jobs: List[JobWithCustomer] = []
+    assets: List[Asset] = []
+    customers: List[Customer] = []
+    deleted: List[DeletedEntity] = []
+
+    class Config:
+        json_encoders = {
+            datetime: format_datetime
+        }
@@ -0,0 +1,53 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The application, on a fresh SQLite database in a temporary directory"""
+    work_dir = tmp_path_factory.mktemp("app")
+    # Log files are written relative to the working directory
+    os.chdir(work_dir)
+    os.environ["SECRET_KEY"] = "test-secret"
+    os.environ["DATABASE_URL"] = f"sqlite:///{work_dir}/app.db"
+    os.environ.pop("DATABASE_READ_URL", None)
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ["EVENT_BACKEND"] = "local"
+    import main
+    return main.app
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    return TestClient(app, base_url="http://localhost")
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/users/register", json={"email": "test@example.com", "username": "test", "password": "test"})
+    assert response.status_code == 200, response.text
+    token = client.post("/token", data={"username": "test", "password": "test"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
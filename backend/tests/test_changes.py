@@ -0,0 +1,44 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+"""
+The change feed cursor never passes changes younger than the settle window,
+which on databases with concurrent writers may still have earlier IDs in flight.
+"""
+
+def create_asset(client, auth_headers, name):
+    response = client.post("/assets/", json={"name": name, "manufacturer": "m", "model": "x"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def test_unsettled_changes_are_held_back(client, auth_headers, monkeypatch):
+    import changelog
+    cursor = client.get("/changes/", headers=auth_headers).json()["cursor"]
+
+    monkeypatch.setattr(changelog, "CHANGE_FEED_SETTLE_SECONDS", 60)
+    asset_id = create_asset(client, auth_headers, "Unsettled asset")
+    feed = client.get("/changes/", params={"since": cursor}, headers=auth_headers).json()
+    assert feed["cursor"] == cursor
+    assert feed["assets"] == []
+    assert client.get("/changes/", headers=auth_headers).json()["cursor"] == cursor
+
+    monkeypatch.setattr(changelog, "CHANGE_FEED_SETTLE_SECONDS", 0)
+    feed = client.get("/changes/", params={"since": cursor}, headers=auth_headers).json()
+    assert feed["cursor"] > cursor
+    assert [asset["id"] for asset in feed["assets"]] == [asset_id]
@@ -0,0 +1,76 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+"""
+ETags built from the change log must change for every logged change, even one
+that commits after a change with a higher ID.
+"""
+
+import pytest
+from sqlalchemy import func, insert, select
+
+@pytest.fixture(scope="module")
+def customer(client, auth_headers):
+    return client.post(
+        "/customers/",
+        json={"name": "ETag customer", "email": "etag@example.com", "phone": "1", "address": "a"},
+        headers=auth_headers
+    ).json()["id"]
+
+@pytest.fixture
+def job(client, auth_headers, customer):
+    return client.post("/jobs/", json={"name": "ETag job", "customer_id": customer}, headers=auth_headers).json()["id"]
+
+def log_entry(entry_id, entity_type, entity_id):
+    import database, models
+    db = database.SessionLocal()
+    try:
+        db.execute(insert(models.ChangeLogEntry).values(
+            id=entry_id, entity_type=entity_type, entity_id=entity_id, action="updated"
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+def latest_entry_id():
+    import database, models
+    db = database.SessionLocal()
+    try:
+        return db.scalar(select(func.max(models.ChangeLogEntry.id)))
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("path", ["/jobs/{}", "/jobs/{}/location_history"])
+def test_late_commit_changes_etag(client, auth_headers, job, path):
+    import changelog
+    url = path.format(job)
+    # Entry first + 1 is allocated first but commits after first + 2
+    first = latest_entry_id()
+    log_entry(first + 2, changelog.JOB, job)
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+    log_entry(first + 1, changelog.JOB, job)
+
+    response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+@pytest.mark.parametrize("if_none_match", ["*", 'W/"0-0.0"'])
+def test_location_history_of_missing_job(client, auth_headers, if_none_match):
+    response = client.get("/jobs/999999/location_history", headers={**auth_headers, "If-None-Match": if_none_match})
+    assert response.status_code == 404
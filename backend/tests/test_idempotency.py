@@ -0,0 +1,110 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+"""
+A reused Idempotency-Key replays the stored response only for the same request:
+same method, path, query string and body.
+"""
+
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+@pytest.fixture(scope="module")
+def job_and_assets(client, auth_headers):
+    assets = [
+        client.post("/assets/", json={"name": f"Idempotency asset {i}", "manufacturer": "m", "model": "x"}, headers=auth_headers).json()["id"]
+        for i in range(2)
+    ]
+    customer = client.post(
+        "/customers/",
+        json={"name": "Idempotency customer", "email": "idempotency@example.com", "phone": "1", "address": "a"},
+        headers=auth_headers
+    ).json()["id"]
+    jobs = [
+        client.post("/jobs/", json={"name": f"Idempotency job {i}", "customer_id": customer}, headers=auth_headers).json()["id"]
+        for i in range(2)
+    ]
+    return jobs, assets
+
+def with_key(headers, key):
+    return {**headers, "Idempotency-Key": key}
+
+def test_same_request_is_replayed(client, auth_headers, job_and_assets):
+    (job, _), (asset, _) = job_and_assets
+    headers = with_key(auth_headers, str(uuid.uuid4()))
+    first = client.post(f"/jobs/{job}/move", params={"asset_id": asset}, headers=headers)
+    second = client.post(f"/jobs/{job}/move", params={"asset_id": asset}, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.headers.get("Idempotent-Replayed") == "true"
+    assert second.json() == first.json()
+
+def test_different_query_string_is_rejected(client, auth_headers, job_and_assets):
+    (job, _), (first_asset, second_asset) = job_and_assets
+    headers = with_key(auth_headers, str(uuid.uuid4()))
+    assert client.post(f"/jobs/{job}/move", params={"asset_id": second_asset}, headers=headers).status_code == 200
+    response = client.post(f"/jobs/{job}/move", params={"asset_id": first_asset}, headers=headers)
+    assert response.status_code == 422
+    assert client.get(f"/jobs/{job}", headers=auth_headers).json()["current_asset_id"] == second_asset
+
+def test_different_body_is_rejected(client, auth_headers, job_and_assets):
+    jobs, (asset, _) = job_and_assets
+    headers = with_key(auth_headers, str(uuid.uuid4()))
+    first = client.post("/jobs/batch_move", json={"moves": [{"job_id": jobs[0], "asset_id": asset}]}, headers=headers)
+    assert first.status_code == 200
+    response = client.post("/jobs/batch_move", json={"moves": [{"job_id": jobs[1], "asset_id": asset}]}, headers=headers)
+    assert response.status_code == 422
+
+def test_key_loaded_from_table_keeps_its_expiry(client, auth_headers, job_and_assets):
+    import database, idempotency, models
+    jobs, _ = job_and_assets
+    customer = client.get(f"/jobs/{jobs[0]}", headers=auth_headers).json()["customer_id"]
+    key = str(uuid.uuid4())
+    headers = with_key(auth_headers, key)
+    body = {"name": "Expiring key job", "customer_id": customer}
+    assert client.post("/jobs/", json=body, headers=headers).status_code == 200
+
+    # As if the key had been stored by another worker nearly a TTL ago
+    scoped_key = next(cached for cached in idempotency.stored_responses._data if cached.endswith(f":{key}"))
+    idempotency.stored_responses.pop(scoped_key)
+    db = database.SessionLocal()
+    try:
+        record = db.query(models.IdempotencyKey).filter(models.IdempotencyKey.key == scoped_key).one()
+        record.date_created = datetime.now(timezone.utc) - timedelta(seconds=idempotency.IDEMPOTENCY_KEY_TTL_SECONDS - 60)
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.post("/jobs/", json=body, headers=headers)
+    assert response.headers.get("Idempotent-Replayed") == "true"
+    expires_at, _ = idempotency.stored_responses._data[scoped_key]
+    assert expires_at - time.monotonic() <= 60
+
+def test_created_job_is_returned_as_stored(client, auth_headers, job_and_assets):
+    jobs, _ = job_and_assets
+    customer = client.get(f"/jobs/{jobs[0]}", headers=auth_headers).json()["customer_id"]
+    created = client.post(
+        "/jobs/",
+        json={"name": "Due job", "customer_id": customer, "due_date": "2024-01-01T12:00:00+02:00"},
+        headers=with_key(auth_headers, str(uuid.uuid4()))
+    ).json()
+    stored = client.get(f"/jobs/{created['id']}", headers=auth_headers).json()
+    assert created["due_date"] == stored["due_date"]
@@ -0,0 +1,132 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+"""
+The number of SQL statements the job endpoints issue must not grow with the
+number of jobs on a page or the length of a job's location history.
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+SMALL_PAGE = 5
+LARGE_PAGE = 30
+
+@pytest.fixture(scope="module")
+def seeded(client, auth_headers):
+    """Assets, one customer per job, and jobs with short and long location histories"""
+    assets = [
+        client.post("/assets/", json={"name": f"Asset {i}", "manufacturer": "m", "model": "x"}, headers=auth_headers).json()["id"]
+        for i in range(4)
+    ]
+    jobs = []
+    for i in range(LARGE_PAGE):
+        customer = client.post(
+            "/customers/",
+            json={"name": f"Customer {i}", "email": f"customer{i}@example.com", "phone": "1", "address": "a"},
+            headers=auth_headers
+        ).json()["id"]
+        jobs.append(client.post("/jobs/", json={"name": f"Job {i}", "customer_id": customer}, headers=auth_headers).json()["id"])
+    short_job, long_job = jobs[0], jobs[1]
+    client.post(f"/jobs/{short_job}/move", params={"asset_id": assets[0]}, headers=auth_headers)
+    for move in range(10):
+        client.post(f"/jobs/{long_job}/move", params={"asset_id": assets[move % len(assets)]}, headers=auth_headers)
+    return {"assets": assets, "short_job": short_job, "long_job": long_job}
+
+@contextmanager
+def count_statements():
+    """Count the statements sent to the application's databases"""
+    import database
+    engines = {database.engine, database.read_engine}
+    if database.async_engine is not None:
+        engines.add(database.async_engine.sync_engine)
+    counter = {"statements": 0}
+
+    def count(*args):
+        counter["statements"] += 1
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", count)
+
+def statements_for(client, method, url, headers, **kwargs):
+    # The first request warms the principal and reference data caches
+    client.request(method, url, headers=headers, **kwargs)
+    with count_statements() as counter:
+        response = client.request(method, url, headers=headers, **kwargs)
+    assert response.status_code == 200, response.text
+    return counter["statements"]
+
+@pytest.fixture(params=["fast", "fast_uncached", "schema"])
+def serialization(request, monkeypatch):
+    """Each way job responses are built: the fast JSON path with and without the reference cache, and the schemas"""
+    import fastjson
+    import refdata
+    monkeypatch.setattr(fastjson, "FAST_JSON_RESPONSES", request.param != "schema")
+    if request.param == "fast_uncached":
+        for cache in (refdata.assets, refdata.customers):
+            monkeypatch.setattr(cache, "maxsize", 0)
+            cache.invalidate()
+    yield request.param
+    for cache in (refdata.assets, refdata.customers):
+        cache.invalidate()
+
+def test_read_jobs_statements_do_not_grow_with_page_size(client, auth_headers, seeded, serialization):
+    small = statements_for(client, "GET", f"/jobs/?limit={SMALL_PAGE}", auth_headers)
+    large = statements_for(client, "GET", f"/jobs/?limit={LARGE_PAGE}", auth_headers)
+    assert small == large
+
+def test_read_jobs_sparse_statements_do_not_grow_with_page_size(client, auth_headers, seeded, serialization):
+    small = statements_for(client, "GET", f"/jobs/?limit={SMALL_PAGE}&include=customer", auth_headers)
+    large = statements_for(client, "GET", f"/jobs/?limit={LARGE_PAGE}&include=customer", auth_headers)
+    assert small == large
+
+def test_timeline_statements_do_not_grow_with_job_count(client, auth_headers, seeded, serialization):
+    small = statements_for(client, "GET", f"/jobs/timeline?ids={seeded['short_job']}", auth_headers)
+    ids = ",".join(str(job_id) for job_id in range(1, LARGE_PAGE + 1))
+    large = statements_for(client, "GET", f"/jobs/timeline?ids={ids}", auth_headers)
+    assert small == large
+
+def test_read_job_statements_do_not_grow_with_history(client, auth_headers, seeded, serialization):
+    short = statements_for(client, "GET", f"/jobs/{seeded['short_job']}", auth_headers)
+    long = statements_for(client, "GET", f"/jobs/{seeded['long_job']}", auth_headers)
+    assert short == long
+
+def test_move_statements_do_not_grow_with_history(client, auth_headers, seeded):
+    counts = []
+    for job_id in (seeded["short_job"], seeded["long_job"]):
+        # Alternate assets so no move is treated as a duplicate scan
+        client.post(f"/jobs/{job_id}/move", params={"asset_id": seeded["assets"][2]}, headers=auth_headers)
+        with count_statements() as counter:
+            response = client.post(f"/jobs/{job_id}/move", params={"asset_id": seeded["assets"][3]}, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        counts.append(counter["statements"])
+    assert counts[0] == counts[1]
+
+def test_status_statements_do_not_grow_with_history(client, auth_headers, seeded):
+    counts = []
+    for job_id in (seeded["short_job"], seeded["long_job"]):
+        counts.append(statements_for(client, "POST", f"/jobs/{job_id}/status", auth_headers, params={"status": "complete"}))
+    assert counts[0] == counts[1]
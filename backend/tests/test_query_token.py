@@ -0,0 +1,40 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+"""
+Only /events/stream accepts an access token in the query string, and such
+tokens are masked in uvicorn's access log.
+"""
+
+import logging
+
+def test_query_token_is_rejected_outside_the_event_stream(client, auth_headers):
+    token = auth_headers["Authorization"].split(" ", 1)[1]
+    assert client.get("/jobs/", params={"token": token}).status_code == 401
+    assert client.get("/jobs/", headers=auth_headers).status_code == 200
+
+def test_access_log_masks_query_tokens(app):
+    from logger_config import RedactQueryTokenFilter
+    record = logging.LogRecord(
+        "uvicorn.access", logging.INFO, __file__, 1, '%s - "%s %s HTTP/%s" %d',
+        ("127.0.0.1:5000", "GET", "/events/stream?job_id=1&token=secret.jwt.value", "1.1", 200), None
+    )
+    assert RedactQueryTokenFilter().filter(record)
+    assert "secret" not in record.getMessage()
+    assert "/events/stream?job_id=1&token=[redacted]" in record.getMessage()
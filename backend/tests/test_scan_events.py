@@ -0,0 +1,152 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+"""
+Scan events recorded offline are slotted into a job's location history at the
+time they were scanned, without leaving back-to-back stays at the same asset.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+@pytest.fixture(scope="module")
+def assets(client, auth_headers):
+    return [
+        client.post("/assets/", json={"name": f"Scan asset {i}", "manufacturer": "m", "model": "x"}, headers=auth_headers).json()["id"]
+        for i in range(3)
+    ]
+
+@pytest.fixture
+def job(client, auth_headers):
+    customers = client.get("/customers/", headers=auth_headers).json()
+    if customers:
+        customer = customers[0]["id"]
+    else:
+        customer = client.post(
+            "/customers/",
+            json={"name": "Scan customer", "email": "scan@example.com", "phone": "1", "address": "a"},
+            headers=auth_headers
+        ).json()["id"]
+    return client.post("/jobs/", json={"name": "Scanned job", "customer_id": customer}, headers=auth_headers).json()["id"]
+
+def scan(client, auth_headers, *events):
+    response = client.post(
+        "/jobs/scan_events",
+        json={"events": [
+            {"job_id": job_id, "asset_id": asset_id, "scanned_at": scanned_at, "device_id": "test"}
+            for job_id, asset_id, scanned_at in events
+        ]},
+        headers=auth_headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+def history(client, auth_headers, job_id):
+    """(asset, arrival, departure) for each of the job's locations, in order"""
+    return [
+        (location["asset_id"], location["arrival_time"], location["departure_time"])
+        for location in client.get(f"/jobs/{job_id}/location_history", headers=auth_headers).json()
+    ]
+
+def at(hour: int) -> str:
+    return f"2024-01-01T{hour:02d}:00:00+00:00"
+
+def test_scan_before_the_first_location(client, auth_headers, job, assets):
+    scan(client, auth_headers, (job, assets[0], at(10)))
+    scan(client, auth_headers, (job, assets[1], at(8)))
+    assert history(client, auth_headers, job) == [
+        (assets[1], at(8), at(10)),
+        (assets[0], at(10), None),
+    ]
+
+def test_scan_between_two_locations(client, auth_headers, job, assets):
+    scan(client, auth_headers, (job, assets[0], at(10)), (job, assets[1], at(12)))
+    scan(client, auth_headers, (job, assets[2], at(11)))
+    assert history(client, auth_headers, job) == [
+        (assets[0], at(10), at(11)),
+        (assets[2], at(11), at(12)),
+        (assets[1], at(12), None),
+    ]
+    assert client.get(f"/jobs/{job}", headers=auth_headers).json()["current_asset_id"] == assets[1]
+
+def test_scan_at_the_same_asset_as_the_following_location(client, auth_headers, job, assets):
+    scan(client, auth_headers, (job, assets[0], at(10)), (job, assets[1], at(12)))
+    results = scan(client, auth_headers, (job, assets[1], at(11)))
+    locations = history(client, auth_headers, job)
+    assert locations == [
+        (assets[0], at(10), at(11)),
+        (assets[1], at(11), None),
+    ]
+    location_ids = [location["id"] for location in client.get(f"/jobs/{job}/location_history", headers=auth_headers).json()]
+    assert results[0]["location_id"] == location_ids[1]
+
+def test_scan_before_the_first_location_at_the_same_asset(client, auth_headers, job, assets):
+    client.post(f"/jobs/{job}/move", params={"asset_id": assets[2]}, headers=auth_headers)
+    scan(client, auth_headers, (job, assets[2], at(8)))
+    locations = history(client, auth_headers, job)
+    assert len(locations) == 1
+    assert locations[0][0] == assets[2] and locations[0][1] == at(8) and locations[0][2] is None
+
+def test_scan_after_a_completion(client, auth_headers, job, assets):
+    scan(client, auth_headers, (job, assets[0], at(10)))
+    assert client.post(f"/jobs/{job}/status", params={"status": "complete"}, headers=auth_headers).status_code == 200
+    scanned_at = (datetime.now(timezone.utc) + timedelta(seconds=1)).isoformat()
+    results = scan(client, auth_headers, (job, assets[0], scanned_at))
+    locations = history(client, auth_headers, job)
+    assert len(locations) == 2
+    assert locations[0][0] == assets[0] and locations[0][2] is not None
+    assert locations[1] == (assets[0], scanned_at, None)
+    job_data = client.get(f"/jobs/{job}", headers=auth_headers).json()
+    assert job_data["status"] == "in_progress"
+    assert job_data["current_location_id"] == results[0]["location_id"]
+
+@pytest.mark.parametrize("sent", ["2024-01-01T10:00:00Z", "2024-01-01T10:00:00", "2024-01-01T12:00:00+02:00"])
+def test_scanned_at_is_echoed_in_utc(client, auth_headers, job, assets, sent):
+    results = scan(client, auth_headers, (job, assets[0], sent))
+    assert results[0]["scanned_at"] == at(10)
+
+def test_move_committed_during_the_batch_is_not_overwritten(client, auth_headers, job, assets, monkeypatch):
+    import database
+    import refdata
+    from routers import jobs as jobs_router
+    scan(client, auth_headers, (job, assets[0], at(10)))
+    existing = refdata.assets.existing
+
+    def existing_after_a_live_move(db, asset_ids):
+        # A live move commits between the batch reading the job and writing it
+        other = database.SessionLocal()
+        try:
+            jobs_router.apply_job_move(other, job, assets[1], datetime.now(timezone.utc))
+            other.commit()
+        finally:
+            other.close()
+        return existing(db, asset_ids)
+
+    monkeypatch.setattr(refdata.assets, "existing", existing_after_a_live_move)
+    response = client.post(
+        "/jobs/scan_events",
+        json={"events": [{"job_id": job, "asset_id": assets[2], "scanned_at": at(11), "device_id": "test"}]},
+        headers=auth_headers
+    )
+    monkeypatch.undo()
+    assert response.status_code == 409
+    locations = history(client, auth_headers, job)
+    assert [location[2] is None for location in locations].count(True) == 1
+    assert client.get(f"/jobs/{job}", headers=auth_headers).json()["current_asset_id"] == assets[1]
@@ -0,0 +1,45 @@
+'''
+OpenFactoryAssistant
+
+This file is part of OpenFactoryAssistant.
+
+OpenFactoryAssistant is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+OpenFactoryAssistant is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
+'''
+
+"""
+Every worker upgrades the schema at startup, so an upgrade must tolerate
+another worker having made the same change since it looked.
+"""
+
+def test_upgrade_is_a_no_op_when_up_to_date(app):
+    import database
+    assert database.upgrade_schema() == set()
+
+def test_column_added_by_another_worker_is_skipped(app, monkeypatch):
+    import database
+    real_inspect = database.inspect
+
+    class StaleInspector:
+        """Reports jobs.current_location_id as missing, as read before another worker added it"""
+        def __init__(self, engine):
+            self.inspector = real_inspect(engine)
+
+        def get_columns(self, table_name):
+            columns = self.inspector.get_columns(table_name)
+            if table_name == "jobs":
+                columns = [column for column in columns if column["name"] != "current_location_id"]
+            return columns
+
+    monkeypatch.setattr(database, "inspect", StaleInspector)
+    assert database.upgrade_schema() == set()
@@ -17,7 +17,7 @@ You should have received a copy of the GNU General Public License
 along with OpenFactoryAssistant. If not, see <https://www.gnu.org/licenses/>
 */
 
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import {
   Box,
   Typography,
@@ -74,6 +74,8 @@ import {
   completeJob,
   getAssets,
   updateJobStatus,
+  getChanges,
+  hasChanges,
 } from "../services/jobs";
 import { Customer, getCustomers } from "../services/customers";
 import { getCurrentTime } from "../utils/time";
@@ -83,6 +85,7 @@ export default function Jobs() {
   const theme = useTheme();
   const { token } = useAuth();
   const [jobs, setJobs] = useState<Job[]>([]);
+  const changeCursor = useRef<number | null>(null);
   const [expandedJob, setExpandedJob] = useState<number | null>(null);
   const [jobHistories, setJobHistories] = useState<
     Record<number, JobLocation[]>
@@ -145,8 +148,21 @@ export default function Jobs() {
       }
     };
 
-    fetchData();
-    const refreshInterval = setInterval(fetchData, 30000); // 30 seconds
+    // Only reload when the change feed reports something new since the last load
+    const refreshIfChanged = async () => {
+      if (!token) return;
+      const feed = await getChanges(changeCursor.current, token);
+      if (feed === null) {
+        await fetchData();
+        return;
+      }
+      const changed = changeCursor.current === null || hasChanges(feed);
+      changeCursor.current = feed.cursor;
+      if (changed) await fetchData();
+    };
+
+    refreshIfChanged();
+    const refreshInterval = setInterval(refreshIfChanged, 30000); // 30 seconds
 
     return () => {
       clearInterval(refreshInterval);
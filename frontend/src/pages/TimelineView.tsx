@@ -289,46 +289,30 @@ const TimelineView: React.FC = () => {
       }
 
       try {
-        const jobData = await Promise.all(
-          selectedJobs.map(async (jobId) => {
-            try {
-              // First get the job details
-              const jobResponse = await api.get(`/jobs/${jobId}`);
-              const job = jobResponse.data;
+        // Jobs, location history and referenced assets in a single request
+        const response = await api.get("/jobs/timeline", {
+          params: { ids: selectedJobs.join(",") },
+        });
+        const { jobs, locations, assets } = response.data as {
+          jobs: Job[];
+          locations: Omit<JobLocation, "asset">[];
+          assets: Asset[];
+        };
 
-              // Then get the location history with asset details
-              const locationsResponse = await api.get(
-                `/jobs/${jobId}/location_history`
-              );
-              const locations = locationsResponse.data;
-
-              // For each location, fetch the asset details
-              const locationsWithAssets = await Promise.all(
-                locations.map(async (location: JobLocation) => {
-                  const assetResponse = await api.get(
-                    `/assets/${location.asset_id}`
-                  );
-                  return {
-                    ...location,
-                    asset: assetResponse.data,
-                  };
-                })
-              );
-
-              return {
-                job,
-                locations: locationsWithAssets,
-              };
-            } catch (error) {
-              console.error(`Error fetching data for job ${jobId}:`, error);
-              return null;
-            }
-          })
-        );
-
-        const filteredData = jobData.filter(
-          (data): data is TimelineJob => data !== null
-        );
+        const jobsById = new Map(jobs.map((job) => [job.id, job]));
+        const assetsById = new Map(assets.map((asset) => [asset.id, asset]));
+        const filteredData: TimelineJob[] = selectedJobs
+          .filter((jobId) => jobsById.has(jobId))
+          .map((jobId) => jobsById.get(jobId) as Job)
+          .map((job) => ({
+            job,
+            locations: locations
+              .filter((location) => location.job_id === job.id)
+              .map((location) => ({
+                ...location,
+                asset: assetsById.get(location.asset_id) as Asset,
+              })),
+          }));
         setTimelineData(filteredData);
 
         if (selectedJobs.length > 0 && filteredData.length === 0) {
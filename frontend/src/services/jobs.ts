@@ -136,6 +136,40 @@ export const getCurrentLocation = async (
   }
 };
 
+export interface ChangeFeed {
+  cursor: number;
+  has_more: boolean;
+  resync: boolean;
+  jobs: Job[];
+  assets: Asset[];
+  customers: { id: number; name: string }[];
+  deleted: { entity_type: string; entity_id: number }[];
+}
+
+export const hasChanges = (feed: ChangeFeed): boolean =>
+  feed.resync ||
+  feed.jobs.length > 0 ||
+  feed.assets.length > 0 ||
+  feed.customers.length > 0 ||
+  feed.deleted.length > 0;
+
+// Without a cursor only the current cursor is returned
+export const getChanges = async (
+  since: number | null,
+  token: string
+): Promise<ChangeFeed | null> => {
+  try {
+    const response = await axios.get(`${API_URL}/changes/`, {
+      headers: { Authorization: `Bearer ${token}` },
+      params: since === null ? {} : { since },
+    });
+    return response.data;
+  } catch (error) {
+    console.error("Error fetching changes:", error);
+    return null;
+  }
+};
+
 export const getJobs = async (token: string): Promise<Job[]> => {
   try {
     const response = await axios.get(`${API_URL}/jobs`, {
@@ -28,28 +28,11 @@ export const fetchStationsWithJobs = async (
     throw new Error("Authentication token is required");
   }
 
-  const response = await axios.get(`${API_URL}/assets`, {
+  // Single request returning every station with its current jobs
+  const response = await axios.get(`${API_URL}/assets/snapshot`, {
     headers: { Authorization: `Bearer ${token}` },
   });
 
   if (!response.data) throw new Error("Failed to fetch stations");
-  const stations = response.data;
-
-  // Fetch current jobs for each station
-  const stationsWithJobs = await Promise.all(
-    stations.map(async (station: Station) => {
-      const jobsResponse = await axios.get(
-        `${API_URL}/assets/${station.id}/current_jobs`,
-        {
-          headers: { Authorization: `Bearer ${token}` },
-        }
-      );
-      if (jobsResponse.data) {
-        return { ...station, current_jobs: jobsResponse.data };
-      }
-      return station;
-    })
-  );
-
-  return stationsWithJobs;
+  return response.data;
 };